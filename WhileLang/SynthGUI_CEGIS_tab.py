@@ -32,6 +32,12 @@ class CEGIS_Tab:
         # Variable to keep track if a verification process has been canceled or not
         self.verification_cancelled = False
 
+        # The last text and tree of each program of the tab, to parse them incrementally
+        self.parsed_programs = {}
+
+        # The tree and conditions of the last verified output program, and its result
+        self.last_verification = None
+
         # Interactive variables
         self.synth : Synthesizer = None
         self.interactive_window : Toplevel = None # interactive window
@@ -127,7 +133,7 @@ cegis.states_dict = {
     "State_2": ("Fill holes with zeroes", "Fill the program holes with zeros"),
     "State_3_1": ("Try to verify the program", "Try to verify the program"),
     "State_3_2": ("Verification succeeded", "Verification succeeded, return the final program"),
-    "State_3_3": ("Verification failed", "Verification failed, show counter example and exclude current holes combination"),
+    "State_3_3": ("Verification failed", "Verification failed, show counter example, add it to the holes search constraints and exclude current holes combination"),
     "State_4_1": ("Try to find new holes", "Try to find new holes"),
     "State_4_2": ("Couldn't find new holes", "Couldn't find new holes - finish"),
     "State_5": ("New holes found", "New holes found, Show the new holes and fill the program with the new holes")
@@ -492,6 +498,8 @@ def get_final_result(synth_result, program_text):
         error += "1. Try increasing the loop unrolling limit.\n"
         error += "2. Check if the loop invariant is correct.\n"
         error += "3. Check if the pre-condition and post-condition are correct."
+    elif isinstance(synth_result, Synthesizer.SolverUnknown):
+        error = f"Error: Z3 couldn't decide whether the program can be verified ({synth_result}). Try a smaller loop unrolling limit or a simpler program."
     elif isinstance(synth_result, Synthesizer.ProgramHasInvalidVarName):
         error = f"Error: Invalid variable name: {synth_result}.\nPlease use valid variable names which are not of the form 'hole_x', where x is a number."    
     elif isinstance(synth_result, Exception):
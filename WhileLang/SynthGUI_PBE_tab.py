@@ -40,6 +40,12 @@ class PBE_Tab:
         # Variable to keep track if a verification process has been canceled or not
         self.verification_cancelled = False
 
+        # The last text and tree of each program of the tab, to parse them incrementally
+        self.parsed_programs = {}
+
+        # The tree and conditions of the last verified output program, and its result
+        self.last_verification = None
+
 pbe = PBE_Tab()
 
 # ------------------------------
@@ -195,7 +201,7 @@ def set_examples_routine(tab: PBE_Tab):
     program = tab.program_input.get("1.0", tk.END).strip()
     
     # First try to parse the program
-    ast = parse(program)
+    ast = parse_tab_program(tab, "input", program)
     if ast is None:
         set_disabled_window_text_flash(tab.message_text, "Error: Invalid program. Please enter a valid program, and then set the examples.", True)
         return
@@ -311,7 +317,7 @@ def process_pbe_program_input():
     # Check if the program is valid
     # Also check if the program has the same parameters as the examples
     try:
-        ast = parse(program_text)
+        ast = parse_tab_program(pbe, "input", program_text)
         if ast is None:
             set_disabled_window_text_flash(pbe.message_text, "Error: The given program can't be parsed", True)
             clear_output(pbe)
@@ -375,6 +381,8 @@ def process_pbe_program_input():
                     final_output = program_text
                 elif isinstance(synth_result, Synthesizer.ProgramHasInvalidVarName):
                     error = f"Error: Invalid variable name: {synth_result}.\nPlease use valid variable names which are not of the form 'hole_x', where x is a number."
+                elif isinstance(synth_result, Synthesizer.SolverUnknown):
+                    error = f"Error: Z3 couldn't decide whether the program can be verified ({synth_result}). Try a smaller loop unrolling limit or a simpler program."
                 elif isinstance(synth_result, Synthesizer.NoExamplesProvided):
                     error = "Error: No input-output examples has been provided. Please set examples and then synthesize.\nFor synthesizing without examples, use the CEGIS tab."
                 elif isinstance(synth_result, Exception):
@@ -3,8 +3,8 @@ from tkinter import Toplevel
 from z3 import ForAll, Implies, Not, And, Or
 import os
 from contextlib import redirect_stdout
-from wp import verify
-from syntax.while_lang import parse, remove_assertions_program
+from wp import verify_obligations, eval_conditions
+from syntax.while_lang import parse, reparse_text, remove_assertions_ast, remove_assertions_program
 
 # ------------------------------
 # ToolTip
@@ -129,35 +129,45 @@ class CreateToolTip(object):
             self.tooltip_window.destroy()
             self.tooltip_window = None
 
+# ------------------------------
+# Incremental Parsing
+# ------------------------------
+
+def parse_tab_program(tab, name, program_text):
+    """
+    Parses a program of the tab. The last program parsed under the same name is kept,
+    so only the statements the user changed since then are parsed again.
+    """
+    old_text, old_ast = tab.parsed_programs.get(name, (None, None))
+    ast = reparse_text(old_ast, old_text, program_text)
+    tab.parsed_programs[name] = (program_text, ast)
+    return ast
+
 # ------------------------------
 # Wait Window For Output Program Verification
 # ------------------------------
 
-def verify_program(program_text, P, Q, linv, debug=False):
+def verify_program(ast, P, Q, linv, debug=False):
+    """Verifies the program with its obligations checked in parallel (see `verify_obligations`).
+    Returns whether it is verified, the name of the obligation which failed and its counterexample."""
     if not debug:
         with open(os.devnull, 'w') as f:
             with redirect_stdout(f):
-                ast = parse(program_text)
-                is_verified, solver = verify(P, ast, Q, linv)
+                is_verified, failed, counter_ex = verify_obligations(P, ast, Q, linv)
     else:
-        ast = parse(program_text)
-        is_verified, solver = verify(P, ast, Q, linv)
-
-    counter_ex = ""
-    if is_verified != True:
-        counter_ex = solver.model()
+        is_verified, failed, counter_ex = verify_obligations(P, ast, Q, linv)
 
-    return is_verified, counter_ex
+    return is_verified, failed, counter_ex
 
-def run_verifier(program_text, queue, P_str = None, Q_str = None, linv_str = None):
+def run_verifier(ast, queue, P_str = None, Q_str = None, linv_str = None):
     try:
         P, Q, linv = eval_conditions(P_str, Q_str, linv_str)
-        is_verified, counter_ex = verify_program(program_text, P, Q, linv, True)
+        is_verified, failed, counter_ex = verify_program(ast, P, Q, linv, True)
 
         if is_verified:
             queue.put(">> The program is verified.")
         else:
-            queue.put(">> The program is NOT verified.\nCounterexample: " + str(counter_ex))
+            queue.put(">> The program is NOT verified.\nFailed: " + failed + "\nCounterexample: " + str(counter_ex))
 
     except Exception as e:
         queue.put(e)
@@ -195,10 +205,19 @@ def verify_output_program(tab):
     tab.message_text.delete('1.0', tk.END)  # Clear previous output
 
     program_text = tab.output_text.get("1.0", tk.END).strip()  # Get text from output area
-    program_text = remove_assertions_program(program_text)  # Remove assertions from the program
+
+    # If the program and the conditions didn't change since the last verification, show its result again
+    ast = parse_tab_program(tab, "output", program_text)
+    verification_key = (ast, tab.P_str, tab.Q_str, tab.linv_str)
+    if ast is not None and tab.last_verification is not None and tab.last_verification[0] == verification_key:
+        set_disabled_window_text_flash(tab.message_text, tab.last_verification[1])
+        return
+
+    # Remove assertions from the program, reusing the tree of the last parse
+    ast_no_asserts = remove_assertions_ast(ast)
 
     queue = multiprocessing.Queue()
-    process = multiprocessing.Process(target = run_verifier, args=(program_text, queue, tab.P_str, tab.Q_str, tab.linv_str))
+    process = multiprocessing.Process(target = run_verifier, args=(ast_no_asserts, queue, tab.P_str, tab.Q_str, tab.linv_str))
     process.start()
 
     # Create a wait window which will be destroyed after the synthesis is done. Also pass it a callback function to cancel the synthesis
@@ -237,6 +256,7 @@ def verify_output_program(tab):
                 else:
                     print("Verifier result:", verifier_result)
                     final_output = verifier_result
+                    tab.last_verification = (verification_key, verifier_result)
 
                 set_disabled_window_text_flash(tab.message_text, final_output, error)
 
@@ -419,26 +439,6 @@ def create_scrollable_listbox(root, x, y, height, width):
     return listbox
 
 # Function to evaluate the conditions
-def eval_conditions(P_str, Q_str, linv_str):
-    P = lambda _: True
-    Q = lambda _: True
-    linv = lambda _: True
-
-    safe_env = {
-        'And': And, 'Or': Or, 'Implies': Implies, 'Not': Not, 'ForAll': ForAll
-    }
-
-    if P_str != None:
-        P = eval("lambda d:" + P_str, safe_env)
-    
-    if Q_str != None:
-        Q = eval("lambda d:" + Q_str, safe_env)
-
-    if linv_str != None:
-        linv = eval("lambda d:" + linv_str, safe_env)
-
-    return P, Q, linv
-
 # Function to flash a text widget
 def flash_text_widget(text_widget, original_color, flash_color="yellow", flash_duration=2000):
     # Change to the flash color
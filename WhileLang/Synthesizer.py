@@ -1,15 +1,191 @@
 import typing
 import operator
-from z3 import Int, ForAll, Implies, Not, And, Solver, unsat, sat, Ast, Or
+from z3 import Int, IntVal, FreshInt, Bool, BoolVal, Tactic, ForAll, Implies, Not, And, Solver, unsat, sat, unknown, Ast, Or, substitute
 
 #from WhileLang import syntax
 
 from syntax.tree import Tree
-from syntax.while_lang import parse, parse_and_unroll, tree_to_program, remove_assertions_program
+from syntax.while_lang import parse, unroll_while, name_holes, remove_assertions_ast
 from wp import *
 
 import re
-import copy
+import logging
+
+logger = logging.getLogger(__name__)
+
+def make_solver(random_seed: int = None, tactic: str = None) -> Solver:
+    """Creates a Z3 solver, optionally built from the given tactic and with the given random seed."""
+    solver = Tactic(tactic).solver() if tactic is not None else Solver()
+    if random_seed is not None:
+        solver.set("random_seed", random_seed)
+    return solver
+
+
+class CegisSession:
+    """
+    Keeps the Z3 solvers of a single CEGIS job alive across its iterations.
+
+    The VC of the unrolled holes program is computed once, with the holes as free variables.
+    The verifier asserts its negation, and each candidate is checked by fixing the holes values inside
+    a push/pop scope. The synthesizer gets a copy of the VC for each counter example, where the counter
+    example values are substituted for the program inputs. It also collects the excluded holes combinations,
+    and the holes bounds are asserted in a scope of their own.
+
+    With `iterative_unroll`, the loops are first unrolled once, and the unrolling bound is extended by one
+    iteration whenever a candidate only fails because a loop doesn't exit within the bound, up to `unroll_limit`.
+    Below the limit, a counter example only requires the executions which exit the unrolled loops to be correct,
+    so the constraints the synthesizer has collected stay valid when the bound is extended.
+    """
+
+    def __init__(self, ast_holes: Tree, holes: list, P: Invariant, Q: Invariant, linv: Invariant,
+                 unroll_limit: int = 10, iterative_unroll: bool = False, random_seed: int = None, tactic: str = None):
+        self.holes = {hole: Int(hole) for hole in holes}
+        self.ast_holes = ast_holes
+        self.P, self.Q, self.linv = P, Q, linv
+        self.unroll_limit = unroll_limit
+        # Assumed by the verifier to check that the unrolled loops exit within the bound
+        self.unroll_bound = Bool("unroll_bound")
+
+        self.verifier = make_solver(random_seed, tactic)
+        self.synthesizer = make_solver(random_seed, tactic)
+        # True while the latest counter example is kept in a scope of its own (exclusion only mode)
+        self.counter_example_scope = False
+        # The counter examples whose constraints are extended along with the unrolling bound
+        self.counter_examples = []
+
+        self.unroll(1 if iterative_unroll else unroll_limit)
+
+    def unroll(self, unroll: int):
+        """Unrolls the loops of the holes program `unroll` times and computes its VC."""
+        self.unroll_count = min(unroll, self.unroll_limit)
+        logger.debug("unrolling bound: %s", self.unroll_count)
+
+        ast_holes_unrolled = unroll_while(self.ast_holes, self.unroll_count)
+        wp = WP(ast_holes_unrolled, self.unroll_bound)
+        self.env = wp.env
+        self.pre, self.vc, self.definitions = wp.vc(ast_holes_unrolled, self.P, self.Q, self.linv)
+
+        # The verifier only checks validity, so the rules of the loops left can be skolemized
+        pre, vc, definitions = self.pre, self.vc, self.definitions
+        if wp.has_loop(ast_holes_unrolled):
+            pre, vc, definitions = WP(ast_holes_unrolled, self.unroll_bound, skolemize=True).vc(
+                ast_holes_unrolled, self.P, self.Q, self.linv)
+
+        # Only the VC of the current bound is kept by the verifier
+        if self.verifier.num_scopes() > 0:
+            self.verifier.pop()
+        self.verifier.push()
+        self.verifier.add(Not(Implies(And(pre, *definitions), vc)))
+
+        for ce in self.counter_examples:
+            self.add_counter_example_constraint(ce)
+
+    def check(self, solver: Solver, *assumptions):
+        """Checks the solver under the given assumptions. Raises `Synthesizer.SolverUnknown` if Z3 can't decide,
+        since neither answer may be assumed then."""
+        result = solver.check(*assumptions)
+        if result == unknown:
+            raise Synthesizer.SolverUnknown(f"Z3 couldn't decide a query of the synthesis: {solver.reason_unknown()}")
+        return result
+
+    def verify(self, holes_dict: dict):
+        """Verifies the holes program with the given holes values.
+        Returns (True, None) if it is verified, otherwise (False, model) where the model is a counter example."""
+        while True:
+            self.verifier.push()
+            self.verifier.add([self.holes[hole] == value for hole, value in holes_dict.items()])
+            try:
+                if self.check(self.verifier, self.unroll_bound) == unsat:
+                    result = True, None
+                elif self.unroll_count == self.unroll_limit:
+                    result = False, self.verifier.model()
+                elif self.check(self.verifier, Not(self.unroll_bound)) == sat:
+                    # The program fails within the current bound
+                    result = False, self.verifier.model()
+                else:
+                    # The program only fails because a loop doesn't exit within the current bound
+                    result = None
+            finally:
+                self.verifier.pop()
+
+            if result is None:
+                self.unroll(self.unroll_count + 1)
+                continue
+
+            logger.info(">> The program is verified." if result[0] else ">> The program is NOT verified.")
+            return result
+
+    def add_counter_example(self, ce: dict, keep_previous: bool = True):
+        """Requires the holes to satisfy the holes program when it starts with the counter example inputs.
+        If `keep_previous` is False, the constraints of the previous counter example are dropped."""
+        if not keep_previous:
+            if self.counter_example_scope:
+                self.synthesizer.pop()
+            self.synthesizer.push()
+            self.counter_example_scope = True
+            self.counter_examples = []
+
+        self.counter_examples.append(ce)
+        self.add_counter_example_constraint(ce)
+
+    def add_counter_example_constraint(self, ce: dict):
+        inputs = [(self.env[var], IntVal(value)) for var, value in ce.items() if var in self.env]
+        # The intermediate states of each counter example are different, so they get constants of their own
+        intermediates = [(d.arg(0), FreshInt(str(d.arg(0)).split("!")[0])) for d in self.definitions]
+        # Below the unrolling limit, longer executions of the counter example may still be correct
+        bound = [(self.unroll_bound, BoolVal(self.unroll_count == self.unroll_limit))]
+        self.synthesizer.add(substitute(And(self.pre, self.vc, *self.definitions), *inputs, *intermediates, *bound))
+
+    def exclude(self, holes_dict: dict):
+        """Excludes the given holes combination from the holes search."""
+        if self.counter_example_scope:
+            # Exclusions are permanent, so they go below the scope of the latest counter example
+            self.synthesizer.pop()
+            self.counter_example_scope = False
+        self.synthesizer.add(Not(And([self.holes[hole] == value for hole, value in holes_dict.items()])))
+
+    def find_holes(self, bound: int = None):
+        """Looks for holes values which satisfy all the constraints collected so far, within [-bound, bound] if a bound is given.
+        Returns (True, holes_dict) if there are such values, otherwise (False, None).
+        Raises `Synthesizer.SolverUnknown` if Z3 can't decide whether there are."""
+        self.synthesizer.push()
+        try:
+            if bound is not None:
+                self.synthesizer.add([And(var >= -bound, var <= bound) for var in self.holes.values()])
+            if self.check(self.synthesizer) == sat:
+                model = self.synthesizer.model()
+                return True, {hole: model.eval(var, model_completion=True).as_long() for hole, var in self.holes.items()}
+            return False, None
+        finally:
+            self.synthesizer.pop()
+
+    def find_small_holes(self, bound: int):
+        """Looks for holes values within [-bound, bound]. If there are none, an unbounded solution is looked for,
+        and the smallest bound which has a solution is found by a binary search up to its largest value.
+        Returns (True, holes_dict, bound) with the bound the values were found in, or (False, None, bound)
+        if there is no solution at all."""
+        result, holes_dict = self.find_holes(bound)
+        if result:
+            return True, holes_dict, bound
+
+        logger.debug("No solution within current bounds - Finding holes without bounds")
+        result, holes_dict = self.find_holes()
+        if not result:
+            return False, None, bound
+
+        # There is no solution within `low`, and there is one within `high`
+        low, high = bound, max(abs(value) for value in holes_dict.values())
+        while high - low > 1:
+            middle = (low + high) // 2
+            result, middle_holes_dict = self.find_holes(middle)
+            if result:
+                high, holes_dict = middle, middle_holes_dict
+            else:
+                low = middle
+
+        logger.debug("new bounds: %s, %s", -high, high)
+        return True, holes_dict, high
+
 
 class Synthesizer:
 
@@ -37,13 +213,21 @@ class Synthesizer:
         """Raised when a specific program is not valid."""
         pass
 
+    class SynthesisAborted(Exception):
+        """Raised when the synthesis is stopped before it is done."""
+        pass
+
+    class SolverUnknown(Exception):
+        """Raised when Z3 can't decide a query of the synthesis (e.g. a nonlinear one)."""
+        pass
+
     def __init__(self, program):
         self.orig_program = program
         self.ast_orig = parse(self.orig_program)
         self.pvars = []
 
         if self.ast_orig is None:
-            print("Error: Invalid program")
+            logger.info("Error: Invalid program")
         else:
             self.pvars = sorted(list(getPvars(self.ast_orig)))
 
@@ -54,18 +238,27 @@ class Synthesizer:
         self.abort_flag = [False]
 
     def process_holes(self, orig_program):
-        """Replaces all occurrences of '??' in the program string with unique hole variables."""
-        holes_program = copy.deepcopy(orig_program)
-        holes = []
-        hole_counter = 0
-        while '??' in holes_program:
-            hole_var = f"hole_{hole_counter}"  # Create a unique hole variable
-            holes_program = holes_program.replace('??', hole_var, 1)  # Replace only the first occurrence of '??'
-            holes.append(hole_var)  # Add the hole variable to holes
-            hole_counter += 1  # Increment the hole counter for uniqueness
+        """Replaces all occurrences of '??' in the program string with unique hole variables.
+        The holes are numbered by their order in the program, the same as `name_holes` numbers them in the AST."""
+        parts = orig_program.split('??')
+        holes = [f"hole_{hole_counter}" for hole_counter in range(len(parts) - 1)]
+        holes_program = "".join(part + hole_var for part, hole_var in zip(parts, holes)) + parts[-1]
 
         return holes_program, holes
 
+    def parse_program(self, program):
+        """Parses the program, reusing the AST of the synthesizer's program when it is the same one."""
+        if program == self.orig_program:
+            return self.ast_orig
+        return parse(program)
+
+    def prepend_inputs(self, inputs, ast):
+        """Returns the AST of `ast` preceded by assignments of the given (var, value) inputs."""
+        for var, value in reversed(inputs):
+            assignment = Tree(":=", [Tree("id", [Tree(var)]), Tree("num", [Tree(int(value))])])
+            ast = Tree(";", [assignment, ast])
+        return ast
+
     def add_example(self, input, output):
         """Adds a single input-output example pair to the synthesizer."""
         self.inputs.append(input)
@@ -76,10 +269,10 @@ class Synthesizer:
             inputs/outputs are lists of tuples (var, value)"""
         
         if(self.pvars == []):
-            print("Error: no vars in the program")
+            logger.info("Error: no vars in the program")
             return
 
-        print("pvars: ", self.pvars)
+        logger.debug("pvars: %s", self.pvars)
 
         try:
             if inputs != [] or outputs != []:
@@ -98,22 +291,22 @@ class Synthesizer:
                 self.inputs.append(new_example_in)
                 self.outputs.append(new_example_out)
         except ValueError:
-            print("Error: input/output variable not found in program")
+            logger.info("Error: input/output variable not found in program")
 
     def verify(self, ast, P, Q, linv):
         if ast is not None:
-            wp = WP(ast)
-            wp_stmt = wp.wp(ast, Q, linv)
-            VC = Implies(P(wp.env), wp_stmt(wp.env))
+            wp = WP(ast, skolemize=True)
+            pre, post, definitions = wp.vc(ast, P, Q, linv)
+            VC = Implies(And(pre, *definitions), post)
 
             solver = Solver()
             solver.add(Not(VC))
 
             if solver.check() == unsat:
-                print(">> The program is verified.")
+                logger.info(">> The program is verified.")
             else:
-                print(">> The program is Not verified.")
-                print("Counterexample: ", solver.model())
+                logger.info(">> The program is Not verified.")
+                logger.info("Counterexample: %s", solver.model())
 
     def generate_conditions(self, inputs, outputs, pvars):
         P = []
@@ -122,32 +315,29 @@ class Synthesizer:
         output_example_tuples = []
 
         for example_input, example_output in zip(inputs, outputs):
-            p = lambda d: True
-            q = lambda d: True
             inputs_tuples = []
             output_tuples = []
 
-            print("\nadding conditions to P:")
+            logger.debug("adding conditions to P:")
             for var, value in zip(pvars, example_input):
                 if value != '_':
-                    prev_p = copy.deepcopy(p)
-                    p = lambda d, p = prev_p, var = var, value = value: And(p(d), d[var] == value)
-                    print(f"var = {var}, value = {value}")
+                    logger.debug("var = %s, value = %s", var, value)
                     inputs_tuples.append((var, value))
                     
 
-            print("\nadding conditions to Q:")
+            logger.debug("adding conditions to Q:")
             for var, value in zip(pvars, example_output):
                 if value != '_':
-                    prev_q = copy.deepcopy(q)
-                    q = lambda d, q = prev_q, var = var, value = value: And(q(d), d[var] == value)
-                    print(f"var = {var}, value = {value}")
+                    logger.debug("var = %s, value = %s", var, value)
                     output_tuples.append((var, value))
 
+            # Each condition is a single flat conjunction of the example's values
+            p = lambda d, tuples = inputs_tuples: And(True, *[d[var] == value for var, value in tuples])
+            q = lambda d, tuples = output_tuples: And(True, *[d[var] == value for var, value in tuples])
+
             inputs_example_tuples.append(inputs_tuples)
             output_example_tuples.append(output_tuples)
 
-            print("\n")
 
             P.append(p)
             Q.append(q)
@@ -157,7 +347,7 @@ class Synthesizer:
     def fill_holes(self, program, sol):
         """Fills the holes in the program with the values from the solver model."""
         holes_to_fill_dict = self.extract_holes_from_dict(extract_model_assignments(sol))
-        print("holes_to_fill_dict: ", holes_to_fill_dict)
+        logger.debug("holes_to_fill_dict: %s", holes_to_fill_dict)
 
         return self.fill_holes_dict(program, holes_to_fill_dict)
     
@@ -176,8 +366,8 @@ class Synthesizer:
 
     def fill_holes_with_zeros(self, program, holes: list):
         """Fills the holes in the program with a '0'"""
-        print("hole to fill with zeroes: ", holes)
-        print("program: ", program)
+        logger.debug("hole to fill with zeroes: %s", holes)
+        logger.debug("program: %s", program)
     
         holes_dict = {}
         for hole in holes:
@@ -200,6 +390,12 @@ class Synthesizer:
         non_holes_dict = {k: v for k, v in dict.items() if not hole_pattern.match(k)}
         return non_holes_dict
 
+    def extract_counter_example(self, model, pvars):
+        """Extracts a full counter example from the verifier model - a value for each program variable.
+        Variables which the model doesn't mention get their default value, so the counter example never
+        leaves free inputs behind when it is added to the synthesis constraints."""
+        return {var: model.eval(Int(var), model_completion=True).as_long() for var in pvars}
+
     def check_for_hole(self, variables):
         # Regular expression to match the pattern "hole_" followed by a number
         pattern = r'\bhole_\d+\b'
@@ -220,32 +416,30 @@ class Synthesizer:
         if linv is None:
             linv = lambda d: True
 
-        ast_orig = parse(orig_program)
+        ast_orig = self.parse_program(orig_program)
 
-        if(self.ast_orig is None):
-            print("Error: Invalid program")
+        if(ast_orig is None):
+            logger.info("Error: Invalid program")
             if(raise_errors):
                 raise self.ProgramNotValid("The given program can't be parsed")
             return ""
 
         pvars = sorted(list(getPvars(ast_orig)))
-        print("Pvars: ", pvars)
+        logger.debug("Pvars: %s", pvars)
 
         holes_vars_check = self.check_for_hole(pvars)
         if holes_vars_check is not None:
-            print("Error: Invalid variable name: {holes_vars_check}")
+            logger.info("Error: Invalid variable name: %s", holes_vars_check)
             if(raise_errors):
                 raise self.ProgramHasInvalidVarName(f"{holes_vars_check}")
             return ""
 
-        print("generating conditions")
+        logger.debug("generating conditions")
         P_inputs, Q_outputs, examples_inputs_tuples, output_example_tuples = self.generate_conditions(inputs, outputs, pvars)
 
         # Add Q conditions for each output example
         for i in range(len(Q_outputs)):
-            prev_Q_i = copy.deepcopy(Q_outputs[i])
-            Q_add = copy.deepcopy(Q)
-            Q_outputs[i] = lambda d, q_cond = prev_Q_i, q = Q_add: And(q(d), q_cond(d))
+            Q_outputs[i] = lambda d, q_cond = Q_outputs[i]: And(Q(d), q_cond(d))
 
         # Add P conditions for each input example
         # for i in range(len(P_inputs)):
@@ -254,10 +448,11 @@ class Synthesizer:
         #     P_inputs[i] = lambda d, p_cond = prev_P_i, p = P_add: And(p(d), p_cond(d))
 
 
-        holes_program, holes = self.process_holes(orig_program) # Replace all occurrences of '??' with unique hole variables, returnes program with holes vars, and holes vars list
+        holes_program, _ = self.process_holes(orig_program) # Replace all occurrences of '??' with unique hole variables, returnes program with holes vars
+        ast_holes, holes = name_holes(ast_orig) # The same holes, as nodes of the program AST
         
         if(holes == []):
-            print("Error: The given program has no holes in it")
+            logger.info("Error: The given program has no holes in it")
             if raise_errors:
                 raise self.ProgramHasNoHoles("The given program has no holes in it")
             return ""
@@ -275,21 +470,14 @@ class Synthesizer:
         #     return ""
 
 
-        print("Holes:", holes)
-        ast_holes_unrolled = parse_and_unroll(holes_program, unroll_limit)
-        if(ast_holes_unrolled is None):
-            print("Error: Invalid program")
-            if(raise_errors):
-                raise self.ProgramNotValid("The given program can't be parsed")
-            return ""
-        
-        program_holes_unrolled = tree_to_program(ast_holes_unrolled)
+        logger.debug("Holes: %s", holes)
+        ast_holes_unrolled = unroll_while(ast_holes, unroll_limit)
 
         # Checks for the existence of an input that satisfies the conditions
-        print("program holes unrolled: ", program_holes_unrolled)
+        logger.debug("program holes unrolled: %s", ast_holes_unrolled)
         is_exist_input, solver = is_exist_input_to_satisfy(P, ast_holes_unrolled, Q, linv=linv)
         if(is_exist_input == False):
-            print("Error: The given program has no input which can satisfy the conditions")
+            logger.info("Error: The given program has no input which can satisfy the conditions")
             if raise_errors:
                 raise self.NoInputToSatisfyProgram("The given program has no input which can satisfy the conditions")
             return ""
@@ -302,11 +490,11 @@ class Synthesizer:
 
         wp = WP(ast_holes_unrolled)
 
-        print("inputs: ", inputs)
-        print("outputs: ", outputs)
+        logger.debug("inputs: %s", inputs)
+        logger.debug("outputs: %s", outputs)
 
         if(len(inputs) == 0 and len(outputs) == 0):
-            print("Error: No input-output examples has been provided")
+            logger.info("Error: No input-output examples has been provided")
             if(raise_errors):
                 raise self.NoExamplesProvided("No input-output examples has been provided")
             return ""
@@ -315,98 +503,63 @@ class Synthesizer:
         else:
             for i in range(len(inputs)):            
                 
-                P_i = copy.deepcopy(P)
+                P_i = P
                 # P_i = P_inputs[i]
 
 
-                inputs_code = ""
                 for input in examples_inputs_tuples[i]:
-                    print("add input key:", input[0], ":=", input[1])
-                    inputs_code += f"{input[0]} := {input[1]} ; "
+                    logger.debug("add input key: %s := %s", input[0], input[1])
 
-                outputs_code = ""
                 # for output in output_example_tuples[i]:
                 #     print("add output key:", output[0], ":=", output[1])
-                #     outputs_code += f"; assert {output[0]} = {output[1]} "
-
 
-                holes_program_with_inputs = inputs_code + program_holes_unrolled + outputs_code
-                print("holes_program_with_inputs: \n", holes_program_with_inputs)
-                ast_holes_inputs = parse(holes_program_with_inputs)
+                ast_holes_inputs = self.prepend_inputs(examples_inputs_tuples[i], ast_holes_unrolled)
 
                 # wp = WP(ast_holes_inputs)
-                wp_stmt = wp.wp(ast_holes_inputs, Q_outputs[i], linv)
+                pre, post, definitions = wp.vc(ast_holes_inputs, P_i, Q_outputs[i], linv)
 
-                VC_i = Implies(P_i(wp.env), wp_stmt(wp.env))
+                VC_i = Implies(pre, And(post, *definitions))
                 VC.append(VC_i)
 
-        VC_final = And(VC)
-        solver.add(VC_final)
+        solver.add(VC)
         
         # print(solver)
 
-        if solver.check() == sat:
-            print(">> The program is verified.")
-            print("holes:", str(solver.model()) )
+        result = solver.check()
+        if result == unknown:
+            logger.info(">> Z3 couldn't decide whether the program can be verified.")
+            if(raise_errors):
+                raise self.SolverUnknown(f"Z3 couldn't decide a query of the synthesis: {solver.reason_unknown()}")
+            return ""
+        elif result == sat:
+            logger.info(">> The program is verified.")
+            logger.debug("holes: %s", solver.model())
             filled_program = self.fill_holes(holes_program, solver)
             filled_program, _ = self.fill_holes_with_zeros(filled_program, holes)
-            print("final program:")
-            print(filled_program) 
+            logger.info("final program: %s", filled_program)
             return filled_program
         else:
-            print(">> The program is NOT verified.")
+            logger.info(">> The program is NOT verified.")
             if(raise_errors):
                 raise self.ProgramNotVerified("The given program can't be verified for the given input-output examples")
             return ""
     
-    def find_holes(self, ast, P, Q, linv):
-        wp = WP(ast)
-        wp_stmt = wp.wp(ast, Q, linv)
-
-        VC = And(P(wp.env), wp_stmt(wp.env))
-        
-        solver = Solver()
-        solver.add(VC)
-
-        if solver.check() == unsat:
-            del solver
-            return False, None
-        else:
-            return True, solver
-
-    def fill_ast_holes(self, ast: Tree, holes: dict) -> Tree:
-        if(ast.root == "id"):
-            # print(ast.root)
-            if ast.subtrees[0].root in holes:
-                # print("found hole: ", ast.subtrees[0].root)
-                ast.root = "num"
-                ast.subtrees[0].root = holes[ast.subtrees[0].root]
-                return ast
-        
-        else:
-            for child in ast.subtrees:
-                self.fill_ast_holes(child, holes)
-
-    
-    def cegis_init_checks(self, orig_program, P, Q, linv, unroll_limit):
-        ast_orig = parse(orig_program)
-        if(self.ast_orig is None):
+    def cegis_init_checks(self, orig_program, P, Q, linv):
+        ast_orig = self.parse_program(orig_program)
+        if(ast_orig is None):
             raise self.ProgramNotValid("The given program can't be parsed")
         
-        program_without_assertions = remove_assertions_program(orig_program)
-        print("program_without_assertions: ", program_without_assertions)
-        if program_without_assertions == None:
-            raise self.ProgramNotValid("The given program can't be parsed")
-        ast_without_assertion = parse(program_without_assertions)
+        ast_without_assertion = remove_assertions_ast(ast_orig)
+        logger.debug("program_without_assertions: %s", ast_without_assertion)
         if(ast_without_assertion is None):
             raise self.ProgramNotValid("The given program can't be parsed")
 
         pvars = sorted(list(getPvars(ast_orig)))
-        print("Pvars: ", pvars)
+        logger.debug("Pvars: %s", pvars)
 
         holes_vars_check = self.check_for_hole(pvars)
         if holes_vars_check is not None:
-            print("Error: Invalid variable name: {holes_vars_check}")
+            logger.info("Error: Invalid variable name: %s", holes_vars_check)
             raise self.ProgramHasInvalidVarName(f"{holes_vars_check}")
 
         if linv is None:
@@ -418,23 +571,14 @@ class Synthesizer:
         if Q is None:
             Q = lambda d: True
 
-        holes_program, holes = self.process_holes(orig_program) # Replace all occurrences of '??' with unique hole variables, returnes program with holes vars, and holes vars list
+        holes_program, _ = self.process_holes(orig_program) # Replace all occurrences of '??' with unique hole variables, returnes program with holes vars
+        ast_holes, holes = name_holes(ast_orig) # The same holes, as nodes of the program AST
 
-        print("holessss: ", holes)
+        logger.debug("holessss: %s", holes)
 
         if(holes == []):
             raise self.ProgramHasNoHoles("The given program has no holes in it")
 
-        ast_holes = parse(holes_program)
-        if(ast_holes is None):
-            raise self.ProgramNotValid("The given program can't be parsed")
-        
-        ast_holes_unrolled = parse_and_unroll(holes_program, unroll_limit)
-        if(ast_holes_unrolled is None):
-            raise self.ProgramNotValid("The given program can't be parsed")
-        program_holes_unrolled = tree_to_program(ast_holes_unrolled)
-        print(f"program_holes_unrolled: \n{program_holes_unrolled}\n")
-
         # Checks for the existence of an input that satisfies the conditions
         # print(holes_program)
         # is_there_valid_input, solver_valid = is_exist_input_to_satisfy(P, ast_holes_unrolled, Q, linv)
@@ -444,304 +588,141 @@ class Synthesizer:
         #     # raise self.NoInputToSatisfyProgram("The given program has no input which can satisfy the conditions")
         # if solver_valid != None:
         #     del solver_valid
-        
-        return holes, holes_program, program_holes_unrolled, P, Q, linv
+
+        return holes, holes_program, ast_holes, pvars, P, Q, linv
     
-    def cegis_interactive(self, orig_program, P, Q, linv = None, unroll_limit = 10):
+    def cegis_interactive(self, orig_program, P, Q, linv = None, unroll_limit = 10, accumulate_counter_examples = True, iterative_unroll = False,
+                          initial_bound = 5):
         self.abort_flag = [False]
 
         yield ("State_0", "Wait for initialization", orig_program)
 
-        holes, holes_program, program_holes_unrolled, P, Q, linv = self.cegis_init_checks(orig_program, P, Q, linv, unroll_limit)
+        holes, holes_program, ast_holes, pvars, P, Q, linv = self.cegis_init_checks(orig_program, P, Q, linv)
 
         yield ("State_1", "Replace holes with variables", holes_program)
 
-        # First, we fill the program holes with zeros
-        filled_program_unrolled, filled_holes_dict = self.fill_holes_with_zeros(program_holes_unrolled, holes)
-
-        prev_filled_holes_dict = copy.deepcopy(filled_holes_dict)
+        # The solvers which are kept alive during the whole synthesis process
+        session = CegisSession(ast_holes, holes, P, Q, linv, unroll_limit, iterative_unroll)
 
-        filled_program, _ = self.fill_holes_with_zeros(holes_program, holes)
+        # First, we fill the program holes with zeros
+        filled_program, filled_holes_dict = self.fill_holes_with_zeros(holes_program, holes)
 
         yield ("State_2", "Fill holes with zeroes", filled_program, filled_holes_dict)
 
-        # Initialize the final holes predicate
-        final_holes_p = lambda d: True
-
-        # Initialize holes dictionary
-        new_holes_dict = {}
-
         # Add bounderies for holes exploration
-        curr_lower_bound = -5
-        curr_upper_bound = 5
-        holes_bound_p = self.get_bounds_condition(holes, curr_lower_bound, curr_upper_bound)
+        holes_bound = initial_bound
 
         # initialize iteration counter
         k = 0
         while(True):
-            skip = True
-            if(k == 0 or prev_filled_holes_dict != filled_holes_dict):
-                skip = False
-                
-            if(skip == False):
-                k += 1
-                print("\n*******************************************\n")
-                ast_filled = parse(filled_program_unrolled)
-                result, solver = verify(P, ast_filled, Q, linv=linv)
-
-                yield ("State_3_1", "Try to verify the program", result, solver)
-
-                if result == True:
-                    filled_program_final = self.fill_holes_dict(holes_program, new_holes_dict)
-                    holes_to_fill_with_zeroes = [key for key in holes if key not in new_holes_dict.keys()]
-                    filled_program_final, _ = self.fill_holes_with_zeros(filled_program_final, holes_to_fill_with_zeroes)
-
-                    yield ("State_3_2", "Verification succeeded, fill program with current holes", filled_program_final)
-
-                    return filled_program_final          
-                
-                ce = self.extract_counter_example_from_dict(extract_model_assignments(solver))
-                if ce == {}:
-                    print("No counter example found - each input is a counter example")
-                    # ce = {'x': 0}
+            k += 1
+            logger.debug("*******************************************")
+            result, model = session.verify(filled_holes_dict)
 
-                yield ("State_3_3", "Verification failed, show counter example", ce, filled_holes_dict)
+            yield ("State_3_1", "Try to verify the program", result, model)
 
-                print("counter example dict:", ce)
+            if result == True:
+                filled_program_final = self.fill_holes_dict(holes_program, filled_holes_dict)
 
-                del solver
+                yield ("State_3_2", "Verification succeeded, fill program with current holes", filled_program_final)
 
-                inputs_code = ""
-                for input_key in ce:
-                    print("add input key:", input_key, ":=", ce[input_key])
-                    inputs_code += f"{input_key} := {ce[input_key]} ; "
-
-                holes_program_with_inputs = inputs_code + program_holes_unrolled
-                ast_holes_inputs = parse(holes_program_with_inputs)
-
-                holes_p = lambda d: True
-                for hole_key in filled_holes_dict:
-                    val = filled_holes_dict[hole_key]
-                    print("excluded hole key:", hole_key, "!=", val)
-                    hole_p = lambda d, key = hole_key, value = val: d[key] == value
-                    holes_p = lambda d, p = copy.deepcopy(holes_p), q = copy.deepcopy(hole_p): And(p(d), q(d))
-
-                final_holes_p = lambda d, p = copy.deepcopy(final_holes_p), q = holes_p: And(p(d), Not(q(d)))
-
-            final_P = lambda d, p = copy.deepcopy(P), h = copy.deepcopy(final_holes_p), q = copy.deepcopy(holes_bound_p): And(p(d), h(d), q(d))
-            final_P_no_bounds = lambda d, p = copy.deepcopy(P), h = copy.deepcopy(final_holes_p): And(p(d), h(d))
-
-            # First, try to solve without holes bounds, to see if there is no solution at all.
-            if(skip == False):
-                print("Finding holes without bounds")
-                result, solver1 = self.find_holes(ast_holes_inputs, final_P_no_bounds, Q, linv=linv)
-                if result == False:
-                    print("The program can't be verified for all possible inputs")
-                    print("num of iterations:", k)
-                    yield ("State_4_2", "Couldn't find new holes", False)
+                return filled_program_final          
+            
+            ce = self.extract_counter_example(model, pvars)
+            if ce == {}:
+                logger.debug("No counter example found - each input is a counter example")
+                # ce = {'x': 0}
 
-                print("There is a solution, now try to find holes with bounds")
+            yield ("State_3_3", "Verification failed, show counter example", ce, filled_holes_dict)
 
-                del solver1
+            logger.debug("counter example dict: %s", ce)
 
+            logger.debug("excluded holes: %s", filled_holes_dict)
+            session.exclude(filled_holes_dict)
+            session.add_counter_example(ce, keep_previous = accumulate_counter_examples)
 
-            print("Finding holes")
+            logger.debug("Finding holes")
+            yield ("State_4_1", "Try to find new holes")
 
-            if(skip == False):
-                yield ("State_4_1", "Try to find new holes")
-            # Now, after we know there is a solution, we can try to find holes with bounds
-            result, solver2 = self.find_holes(ast_holes_inputs, final_P, Q, linv=linv)
+            # Look for the holes with the smallest values, starting from the current bounds
+            result, new_holes_dict, holes_bound = session.find_small_holes(holes_bound)
             if result == False:
-                # If we can't find holes with bounds, we need to increase the bounds.
-                print("No solution within current bounds - Increasing bounds")
-                curr_lower_bound = curr_lower_bound - 20
-                curr_upper_bound = curr_upper_bound + 20
-                print(f"new bounds: {curr_lower_bound}, {curr_upper_bound}")
-                # Update the holes bounds predicate
-                holes_bound_p = self.get_bounds_condition(holes, curr_lower_bound, curr_upper_bound)
-                prev_filled_holes_dict = copy.deepcopy(filled_holes_dict)
-                
-                continue  
-            
-            print("holes:", solver2.model())
+                logger.info("The program can't be verified for all possible inputs")
+                logger.info("num of iterations: %s", k)
+                yield ("State_4_2", "Couldn't find new holes", False)
+                return
             
+            logger.debug("new holes dict: %s", new_holes_dict)
 
-
-            new_holes_dict = self.extract_holes_from_dict(extract_model_assignments(solver2))
-            print("new holes dict:", new_holes_dict)
-
-            # if new_holes_dict == {}:
-            #     print("No new holes found")
-            #     print("num of iterations:", k)
-            #     yield ("State_4_2", "Couldn't find new holes", False)
-            #     return ""
-            
-            del solver2
-            
-            filled_program_unrolled = self.fill_holes_dict(program_holes_unrolled, new_holes_dict)
-            holes_to_fill_with_zeroes = [key for key in holes if key not in new_holes_dict.keys()]
-            filled_program_unrolled, holes_filled_with_zeroes_dict = self.fill_holes_with_zeros(filled_program_unrolled, holes_to_fill_with_zeroes)
-            prev_filled_holes_dict = copy.deepcopy(filled_holes_dict)
             filled_holes_dict = new_holes_dict
-            filled_holes_dict.update(holes_filled_with_zeroes_dict)
 
             # Only for the visualization (interactive CEGIS)
-            filled_program = self.fill_holes_dict(holes_program, new_holes_dict)
-            filled_program, _ = self.fill_holes_with_zeros(filled_program, holes_to_fill_with_zeroes)
+            filled_program = self.fill_holes_dict(holes_program, filled_holes_dict)
 
             yield ("State_5", "New holes found, Fill program with the new holes", filled_program, filled_holes_dict)
 
-
-    def get_bounds_condition(self, holes, lower_bound, upper_bound):
-        final_holes_bound_p = lambda d : True
-        for hole_key in holes:
-            hole_bound_p = lambda d: And(d[hole_key] >= lower_bound, d[hole_key] <= upper_bound)
-            final_holes_bound_p = lambda d, p = copy.deepcopy(final_holes_bound_p), q = copy.deepcopy(hole_bound_p): And(p(d), q(d))
-
-        return final_holes_bound_p
-
-    def synth_program(self, orig_program, P, Q, linv = None, unroll_limit = 10):
+    def synth_program(self, orig_program, P, Q, linv = None, unroll_limit = 10, accumulate_counter_examples = True, iterative_unroll = False,
+                      initial_bound = 5, random_seed = None, tactic = None, should_stop = None):
+        """Synthesizes the holes of the program with CEGIS.
+        When `accumulate_counter_examples` is set, every counter example found so far constrains the holes search.
+        Otherwise only the latest counter example is used, and the search relies on excluding the holes
+        combinations which were already tried.
+        When `iterative_unroll` is set, the loops are unrolled as many times as the verification needs,
+        up to `unroll_limit`, instead of `unroll_limit` times from the start.
+        The holes are first searched within [-initial_bound, initial_bound]. `random_seed` and `tactic` configure
+        the Z3 solvers, and `should_stop` is polled before each iteration to abort the synthesis."""
 
         # Checks if the given program can be parsed, have holes, and variables names are valid
-        # Also returns the holes, holes program, and program with holes unrolled  
-        holes, holes_program, program_holes_unrolled, P, Q, linv = self.cegis_init_checks(orig_program, P, Q, linv, unroll_limit)
-
-        # First, we fill the program holes with zeros
-        filled_program, filled_holes_dict = self.fill_holes_with_zeros(program_holes_unrolled, holes)
-        prev_filled_holes_dict = copy.deepcopy(filled_holes_dict)
+        # Also returns the holes, holes program, holes program AST and the program variables
+        holes, holes_program, ast_holes, pvars, P, Q, linv = self.cegis_init_checks(orig_program, P, Q, linv)
 
-        # Initialize the final holes predicate
-        final_holes_p = lambda d: True
+        # The solvers which are kept alive during the whole synthesis process
+        session = CegisSession(ast_holes, holes, P, Q, linv, unroll_limit, iterative_unroll, random_seed, tactic)
 
-        # Initialize holes dictionary
-        new_holes_dict = {}
+        # First, we fill the program holes with zeros
+        _, filled_holes_dict = self.fill_holes_with_zeros(holes_program, holes)
 
         # Add bounderies for holes exploration
-        curr_lower_bound = -5
-        curr_upper_bound = 5
-        holes_bound_p = self.get_bounds_condition(holes, curr_lower_bound, curr_upper_bound)
+        holes_bound = initial_bound
 
         # initialize iteration counter
         k = 0
         while(True):
-            skip = True
-            if(k == 0 or prev_filled_holes_dict != filled_holes_dict):
-                skip = False
-                
-            if(skip == False):
-                k += 1
-                print("\n*******************************************\n")
-                ast_filled = parse(filled_program)
-                result, solver = verify(P, ast_filled, Q, linv=linv)
-                if result == True:
-                    print("The program is verified")
-                    filled_program_final = self.fill_holes_dict(holes_program, new_holes_dict)
-                    holes_to_fill_with_zeroes = [key for key in holes if key not in new_holes_dict.keys()]
-                    print("holes to fill with zeroes:", holes_to_fill_with_zeroes)
-                    filled_program_final, _ = self.fill_holes_with_zeros(filled_program_final, holes_to_fill_with_zeroes)
-                    print(f"final filled program: {filled_program_final}")
-                    print("num of iterations:", k)
-                    return filled_program_final          
-                
-                ce = self.extract_counter_example_from_dict(extract_model_assignments(solver))
-                if ce == {}:
-                    print("No counter example found - each input is a counter example")
-                    # ce = {'x': 0}
-
-                print("counter example dict:", ce)
-
-                del solver
-
-                # This is dumb - Z3 has a bug when it gives a counter example with inputs which are not equal to inputs we assign in P
-                # Or am I dumb? - I need to check this
-                # For the time being, I will assign the inputs manually to the beginning of the program
-                # inputs_p = lambda d: True
-                # for input_key in ce:
-                #     print("add input key:", input_key, "=", ce[input_key])
-                #     input_p = lambda d: d[input_key] == ce[input_key]
-                #     prev_inputs_p = copy.deepcopy(inputs_p)
-                #     inputs_p = lambda d, p = prev_inputs_p, q = input_p: And(p(d), q(d))
-
-                inputs_code = ""
-                for input_key in ce:
-                    print("add input key:", input_key, ":=", ce[input_key])
-                    inputs_code += f"{input_key} := {ce[input_key]} ; "
-
-                holes_program_with_inputs = inputs_code + program_holes_unrolled
-                ast_holes_inputs = parse(holes_program_with_inputs)
-
-
-                holes_p = lambda d: True
-                
-                print("filled_holes_dict:", filled_holes_dict)
-                for hole_key in filled_holes_dict:
-                    val = filled_holes_dict[hole_key]
-                    print("excluded hole key:", hole_key, "!=", val)
-                    hole_p = lambda d, key = hole_key, value = val: d[key] == value
-                    holes_p = lambda d, p = copy.deepcopy(holes_p), q = copy.deepcopy(hole_p): And(p(d), q(d))
-
-                final_holes_p = lambda d, p = copy.deepcopy(final_holes_p), q = copy.deepcopy(holes_p): And(p(d), Not(q(d)))
-
-            # set the final P with bounds
-            final_P = lambda d, p = copy.deepcopy(P), h = copy.deepcopy(final_holes_p), q = copy.deepcopy(holes_bound_p): And(p(d), h(d), q(d))
-
-            # set the final P without bounds
-            final_P_no_bounds = lambda d, p = copy.deepcopy(P), h = copy.deepcopy(final_holes_p): And(p(d), h(d))
-
-            # First, try to solve without holes bounds, to see if there is no solution at all.
-            if(skip == True):
-                print("Finding holes without bounds")
-                result, solver1 = self.find_holes(ast_holes_inputs, final_P_no_bounds, Q, linv=linv)
-                if result == False:
-                    print("The program can't be verified for all possible inputs")
-                    print("num of iterations:", k)
-                    raise self.ProgramNotVerified("The given program can't be verified for all possible inputs")
+            if should_stop is not None and should_stop():
+                raise self.SynthesisAborted("The synthesis was stopped")
+
+            k += 1
+            logger.debug("*******************************************")
+            result, model = session.verify(filled_holes_dict)
+            if result == True:
+                logger.info("The program is verified")
+                filled_program_final = self.fill_holes_dict(holes_program, filled_holes_dict)
+                logger.info("final filled program: %s", filled_program_final)
+                logger.info("num of iterations: %s", k)
+                return filled_program_final          
+            
+            ce = self.extract_counter_example(model, pvars)
+            if ce == {}:
+                logger.debug("No counter example found - each input is a counter example")
+                # ce = {'x': 0}
 
-                print("There is a solution, now try to find holes with bounds")
+            logger.debug("counter example dict: %s", ce)
 
-                del solver1
+            logger.debug("excluded holes: %s", filled_holes_dict)
+            session.exclude(filled_holes_dict)
+            session.add_counter_example(ce, keep_previous = accumulate_counter_examples)
 
-            # Now, after we know there is a solution, we can try to find holes with bounds
-            print("Finding holes with bounds")
-            result, solver2 = self.find_holes(ast_holes_inputs, final_P, Q, linv=linv)
+            # Look for the holes with the smallest values, starting from the current bounds
+            logger.debug("Finding holes with bounds")
+            result, new_holes_dict, holes_bound = session.find_small_holes(holes_bound)
             if result == False:
-                # If we can't find holes with bounds, we need to increase the bounds.
-                print("No solution within current bounds - Increasing bounds")
-                curr_lower_bound = curr_lower_bound - 20
-                curr_upper_bound = curr_upper_bound + 20
-                print(f"new bounds: {curr_lower_bound}, {curr_upper_bound}")
-
-                # Update the holes bounds predicate
-                holes_bound_p = self.get_bounds_condition(holes, curr_lower_bound, curr_upper_bound)
-
-                prev_filled_holes_dict = copy.deepcopy(filled_holes_dict)
-                continue
-            
-            print(f"\nsolver2 :\n{solver2}\n\n")
-            print("holes:", solver2.model())
+                logger.info("The program can't be verified for all possible inputs")
+                logger.info("num of iterations: %s", k)
+                raise self.ProgramNotVerified("The given program can't be verified for all possible inputs")
             
-            new_holes_dict = self.extract_holes_from_dict(extract_model_assignments(solver2))
-            print("new holes dict:", new_holes_dict)
+            logger.debug("new holes dict: %s", new_holes_dict)
 
-            # if new_holes_dict == {}:
-            #     print("No new holes found")
-            #     print("num of iterations:", k)
-            #     return ""
-            
-            del solver2
-            
-            filled_program = self.fill_holes_dict(program_holes_unrolled, new_holes_dict)
-            holes_to_fill_with_zeroes = [key for key in holes if key not in new_holes_dict.keys()]
-            print("holes to fill with zeroes:", holes_to_fill_with_zeroes)
-            filled_program, holes_filled_with_zeroes_dict = self.fill_holes_with_zeros(filled_program, holes_to_fill_with_zeroes)
-            print("new_holes_dict:", new_holes_dict)
-            print("holes_filled_with_zeroes_dict:", holes_filled_with_zeroes_dict)
-            prev_filled_holes_dict = copy.deepcopy(filled_holes_dict)
             filled_holes_dict = new_holes_dict
-            filled_holes_dict.update(holes_filled_with_zeroes_dict)
-            print("filled_holes_dict:", filled_holes_dict)
-            print("new filled program:")
-            print(filled_program)
 
 
 def main():
@@ -1,5 +1,8 @@
 from pbe_tests import *
 from cegis_tests import *
+from parser_tests import *
+from tree_tests import *
+from wp_tests import *
 import sys
 
 def main(args):
@@ -15,6 +18,12 @@ def main(args):
         pbe_tests()
     elif case == "cegis":
         cegis_tests()
+    elif case == "parser":
+        parser_tests()
+    elif case == "tree":
+        tree_tests()
+    elif case == "wp":
+        wp_tests()
     else:
         print("Invalid case selected.")
 
@@ -2,6 +2,8 @@ from Synthesizer import *
 import os
 from contextlib import redirect_stdout
 from wp import verify
+from portfolio import synth_program_portfolio
+import multiprocessing
 
 RED = "\033[31m"
 GREEN = "\033[32m"
@@ -119,17 +121,17 @@ def basic_case_6():
 class NoErrorExcpected(Exception):
         pass
 
-def test_synth_program(program, P, Q, linv, expected_program, expected_error=NoErrorExcpected, to_disable_print = disable_prints, unroll_limit = 10):
+def test_synth_program(program, P, Q, linv, expected_program, expected_error=NoErrorExcpected, to_disable_print = disable_prints, unroll_limit = 10, iterative_unroll = False):
 
     try:
         if to_disable_print:
             with open(os.devnull, 'w') as f:
                 with redirect_stdout(f):
                     synth = Synthesizer(program)
-                    returned_program = synth.synth_program(program, P, Q, linv, unroll_limit)
+                    returned_program = synth.synth_program(program, P, Q, linv, unroll_limit, iterative_unroll = iterative_unroll)
         else:
             synth = Synthesizer(program)
-            returned_program = synth.synth_program(program, P, Q, linv, unroll_limit)
+            returned_program = synth.synth_program(program, P, Q, linv, unroll_limit, iterative_unroll = iterative_unroll)
     except expected_error as e:
         returned_program = expected_error
     except Exception as e:
@@ -243,6 +245,19 @@ def holes_basic_case_8():
 
     return test_synth_program(program, P, Q, linv, expected_program, expected_error, disable_prints)
 
+def holes_multi_case_1():
+    # Three holes which are only determined together - needs all of the counter examples found so far
+    program = "c1 := ?? ; c2 := ?? ; c3 := ?? ; a := c1 * x ; d := c2 * y ; a := a + d ; b := a + c3 ; e := 3 * x ; f := 2 * y ; e := e - f ; e := e + 7 ; assert b = e"
+
+    P = lambda d: True
+    Q = lambda d: True
+    linv = lambda d: True
+
+    expected_program = ["c1 := 3 ; c2 := -2 ; c3 := 7 ; a := c1 * x ; d := c2 * y ; a := a + d ; b := a + c3 ; e := 3 * x ; f := 2 * y ; e := e - f ; e := e + 7 ; assert b = e"]
+    expected_error = NoErrorExcpected
+
+    return test_synth_program(program, P, Q, linv, expected_program, expected_error, disable_prints)
+
 def holes_no_sol_case_1():
     program = "y:= x + ?? ; if y = 10 then x := 5 else x := 9"
 
@@ -337,6 +352,111 @@ def holes_while_case_3():
 
     return test_synth_program(program, P, Q, linv, expected_program, expected_error, disable_prints, 10)
 
+def iterative_unroll_case_1():
+    # The loop runs 5 times, so the unrolling bound is extended from 1 to 5
+    program = "y := 0 ; x := 0 ; t := ?? ; while x < t do ( y := y + 1 ; x := x + 1)  ; assert y = 5"
+    P = lambda d: True
+    Q = lambda d: True
+    linv = lambda d: True
+
+    expected_program = ["y := 0 ; x := 0 ; t := 5 ; while x < t do ( y := y + 1 ; x := x + 1)  ; assert y = 5"]
+    expected_error = NoErrorExcpected
+
+    return test_synth_program(program, P, Q, linv, expected_program, expected_error, disable_prints, 10, True)
+
+def iterative_unroll_case_2():
+    program = "x := 0 ; t := ?? ; while x < t do ( x := x + ?? ; assert t = 6) ; assert x > 0 ; assert x = 9"
+    P = lambda d: True
+    Q = lambda d: True
+    linv = lambda d: True
+
+    expected_program = ["x := 0 ; t := 6 ; while x < t do ( x := x + 9 ; assert t = 6) ; assert x > 0 ; assert x = 9"]
+    expected_error = NoErrorExcpected
+
+    return test_synth_program(program, P, Q, linv, expected_program, expected_error, disable_prints, 10, True)
+
+def iterative_unroll_case_3():
+    # The unrolled loop is inside a branch, so the rest of the program is assumed away past the bound there too
+    program = "t := ?? ; if t > 0 then ( x := 0 ; while x < t do x := x + 1 ) else x := 0 ; assert x = 3"
+    P = lambda d: True
+    Q = lambda d: True
+    linv = lambda d: True
+
+    expected_program = ["t := 3 ; if t > 0 then ( x := 0 ; while x < t do x := x + 1 ) else x := 0 ; assert x = 3"]
+    expected_error = NoErrorExcpected
+
+    return test_synth_program(program, P, Q, linv, expected_program, expected_error, disable_prints, 10, True)
+
+def test_synth_program_portfolio(program, P_str, Q_str, linv_str, expected_program, expected_error=NoErrorExcpected, unroll_limit = 10):
+
+    try:
+        returned_program = synth_program_portfolio(program, P_str, Q_str, linv_str, unroll_limit)
+    except expected_error as e:
+        returned_program = expected_error
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        returned_program = e
+
+    if(expected_error is not NoErrorExcpected):
+        assertion = returned_program == expected_error
+        return assert_with_color(assertion, program, returned_program, expected_error)
+    else:
+        assertion = returned_program in expected_program
+        return assert_with_color(assertion, program, returned_program, expected_program)
+
+def portfolio_case_1():
+    program = "y := 0 ; x := 0 ; t := ?? ; while x < t do ( y := y + ?? ; x := x + 1)  ; assert y = 10"
+    P_str = None
+    Q_str = "d['t'] == 5"
+    linv_str = None
+
+    expected_program = ["y := 0 ; x := 0 ; t := 5 ; while x < t do ( y := y + 2 ; x := x + 1)  ; assert y = 10"]
+    expected_error = NoErrorExcpected
+
+    return test_synth_program_portfolio(program, P_str, Q_str, linv_str, expected_program, expected_error)
+
+def portfolio_case_2():
+    program = "y:= x + ?? ; if y = 10 then x := 5 else x := 9"
+    P_str = None
+    Q_str = "d['x'] == 8"
+    linv_str = None
+
+    expected_program = ""
+    expected_error = Synthesizer.ProgramNotVerified
+
+    return test_synth_program_portfolio(program, P_str, Q_str, linv_str, expected_program, expected_error)
+
+def portfolio_case_3():
+    # The losing variants are terminated rather than left running their Z3 queries
+    program = "y := 0 ; x := 0 ; t := ?? ; while x < t do ( y := y + ?? ; x := x + 1)  ; assert y = 10"
+    P_str = None
+    Q_str = "d['t'] == 5"
+    linv_str = None
+
+    expected_program = ["y := 0 ; x := 0 ; t := 5 ; while x < t do ( y := y + 2 ; x := x + 1)  ; assert y = 10"]
+
+    returned_program = synth_program_portfolio(program, P_str, Q_str, linv_str, 10)
+    alive = multiprocessing.active_children()
+    assertion = returned_program in expected_program and alive == []
+    return assert_with_color(assertion, program, (returned_program, alive), (expected_program, []))
+
+def portfolio_case_4():
+    # A variant which can't decide fails first, and the result of the one which can still wins
+    program = "y := 0 ; x := 0 ; t := ?? ; while x < t do ( y := y + ?? ; x := x + 1)  ; assert y = 10"
+    P_str = None
+    Q_str = "d['t'] == 5"
+    linv_str = None
+
+    expected_program = ["y := 0 ; x := 0 ; t := 5 ; while x < t do ( y := y + 2 ; x := x + 1)  ; assert y = 10"]
+
+    try:
+        returned_program = synth_program_portfolio(program, P_str, Q_str, linv_str, 10, variants = [{"tactic": "skip"}, {}])
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        returned_program = e
+
+    return assert_with_color(returned_program in expected_program, program, returned_program, expected_program)
+
 def error_case_ProgramNotValid():
     # Can't be parsed (colon at the end)
     program = "x := 0 ; t := ?? ; while x < t do ( x := x + 1 ; assert t = 6) ; assert x > 0 ; assert x = 9 ;"
@@ -361,6 +481,25 @@ def error_case_ProgramHasNoHoles():
 
     return test_synth_program(program, P, Q, linv, expected_program, expected_error, disable_prints, 10)
 
+def error_case_SolverUnknown():
+    # The "skip" tactic can't decide anything, which must not be reported as an unverifiable program
+    program = "c := ?? ; y := c * x ; z := x + x ; assert y = z"
+    P = lambda d: True
+    Q = lambda d: True
+    linv = lambda d: True
+
+    expected_error = Synthesizer.SolverUnknown
+
+    try:
+        returned_program = Synthesizer(program).synth_program(program, P, Q, linv, tactic = "skip")
+    except expected_error as e:
+        returned_program = expected_error
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        returned_program = e
+
+    return assert_with_color(returned_program == expected_error, program, returned_program, expected_error)
+
 def unroll_limit_case_1():
     # The unroll limit will affect the result of the synthesis
     program = "y := 0 ; x := 0 ; t := ?? ; while x < t do ( y := y + ?? ; x := x + ??)  ; assert y = 6 ; assert x <= 6 ; assert x >= 0 ; assert t <= 6"
@@ -530,6 +669,7 @@ def cegis_tests():
         holes_basic_case_6,
         holes_basic_case_7,
         holes_basic_case_8,
+        holes_multi_case_1,
     ]
 
     holes_no_sol_cases = [
@@ -544,10 +684,24 @@ def cegis_tests():
         holes_while_case_3,
     ]
 
+    iterative_unroll_cases = [
+        iterative_unroll_case_1,
+        iterative_unroll_case_2,
+        iterative_unroll_case_3,
+    ]
+
+    portfolio_cases = [
+        portfolio_case_1,
+        portfolio_case_2,
+        portfolio_case_3,
+        portfolio_case_4,
+    ]
+
     errors_cases = [
         error_case_ProgramNotValid,
         error_case_ProgramHasNoHoles,
         error_case_ProgramHasNoHoles,
+        error_case_SolverUnknown,
     ]
 
     unroll_limit_cases = [
@@ -560,6 +714,8 @@ def cegis_tests():
     test_cases += holes_basic_cases
     test_cases += holes_no_sol_cases
     test_cases += holes_while_cases
+    test_cases += iterative_unroll_cases
+    test_cases += portfolio_cases
     test_cases += errors_cases
     test_cases += unroll_limit_cases
 
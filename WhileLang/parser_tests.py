@@ -0,0 +1,138 @@
+from syntax.while_lang import WhileParser, WhileDescentParser, parse, reparse, unroll_while, tree_to_program, name_holes
+from wp import getPvars
+import ast
+
+RED = "\033[31m"
+GREEN = "\033[32m"
+RESET = "\033[0m"
+
+# The test files whose programs both parsers should agree on
+CORPUS_FILES = ["cegis_tests.py", "pbe_tests.py"]
+
+
+def corpus_programs():
+    """All the string literals of the corpus files: the programs, and the conditions and names, which both parsers should reject"""
+    programs = []
+    for file_name in CORPUS_FILES:
+        with open(file_name) as f:
+            tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str) and node.value not in programs:
+                programs.append(node.value)
+    return programs
+
+
+def differential_case(earley, descent, program):
+    expected = earley(program)
+    output = descent(program)
+    if output != expected:
+        print(f"{RED}Parsers disagree!{RESET}")
+        print(f"program: {program}")
+        print(f"earley: {expected}")
+        print(f"descent: {output}")
+        return False
+    return True
+
+
+def error_cases():
+    """Programs with syntax errors, which both parsers should reject"""
+    return [
+        "",
+        "x := 1 ;",
+        "x := 1 + 2 + 3",
+        "if x < 1 then y := 1",
+        "while x < 1 do",
+        "(x := 1",
+        "x := (1 + 2",
+        "assert",
+        "x := 1 y := 2",
+    ]
+
+
+def edits(program):
+    """Some edits of a program: inserting a statement, deleting a character and replacing a word at several offsets"""
+    offsets = sorted(set([0, len(program)] + [i for i, c in enumerate(program) if c in ";(=" or program[i:i + 4] == "else"]))
+    result = []
+    for offset in offsets:
+        result.append((offset, offset, "x := 1 ; "))
+        result.append((offset, min(offset + 1, len(program)), ""))
+        result.append((offset, min(offset + 4, len(program)), "skip"))
+    return result
+
+
+def reparse_case(program):
+    tree = parse(program)
+    for edit in edits(program):
+        start, end, replacement = edit
+        expected = parse(program[:start] + replacement + program[end:])
+        output = reparse(tree, program, edit)
+        if output != expected:
+            print(f"{RED}Reparse disagrees with parse!{RESET}")
+            print(f"program: {program}")
+            print(f"edit: {edit}")
+            print(f"reparse: {output}")
+            print(f"parse: {expected}")
+            return False
+    return True
+
+
+def reparse_reuse_case():
+    """Editing the last statement keeps the trees of the others"""
+    program = "x := 1 ; if x < 2 then y := 2 ; z := 3 else y := 4 ; while y > 0 do y := y - 1"
+    tree = parse(program)
+    edit = (len(program) - 1, len(program), "2")
+    output = reparse(tree, program, edit)
+    reused = output.subtrees[0] is tree.subtrees[0] and output.subtrees[1].subtrees[0] is tree.subtrees[1].subtrees[0]
+    if not reused or output != parse(program[:-1] + "2"):
+        print(f"{RED}Reparse didn't reuse the unchanged statements!{RESET}")
+        return False
+    return True
+
+
+def interned_unroll_case():
+    """The unrolled iterations of an interned tree are a single shared node"""
+    tree = parse("x := 0 ; while x < 10 do (y := y + x ; x := x + 1)")
+    unrolled = unroll_while(tree, 8, interned = True)
+    iterations = set()
+    node = unrolled.subtrees[1].subtrees[0]
+    while node.root == ";":
+        iterations.add(id(node.subtrees[1]))
+        node = node.subtrees[0]
+    iterations.add(id(node))
+    if len(iterations) != 1 or repr(unrolled) != repr(unroll_while(tree, 8)):
+        print(f"{RED}Interned unrolling failed!{RESET}")
+        return False
+    return True
+
+
+def long_program_case():
+    """The passes over a program shouldn't depend on the interpreter stack"""
+    statements = ["x := x + 1", "if x > 3 then y := y + x else y := y - ??", "assert y >= 0"] * 2000
+    tree = unroll_while(parse(" ; ".join(statements) + " ; while x > 0 do x := x - 1"), 4)
+    program = tree_to_program(tree)
+    named, holes = name_holes(tree)
+    if len(holes) != 2000 or getPvars(tree) != {"x", "y"} or parse(program) is None:
+        print(f"{RED}Long program passes failed!{RESET}")
+        return False
+    return True
+
+def parser_tests():
+    earley = WhileParser()
+    descent = WhileDescentParser()
+
+    programs = corpus_programs() + error_cases()
+    results = [program for program in programs if not differential_case(earley, descent, program)]
+    results += [program for program in programs if parse(program) is not None and not reparse_case(program)]
+    if not reparse_reuse_case():
+        results.append("reparse_reuse_case")
+    if not interned_unroll_case():
+        results.append("interned_unroll_case")
+    if not long_program_case():
+        results.append("long_program_case")
+
+    print(f"\n********************************\n")
+
+    if results == []:
+        print(f"{GREEN}All tests passed! ({len(programs)} programs){RESET}")
+    else:
+        print(f"{RED}Tests failed: {RESET} {len(results)} of {len(programs)} programs")
@@ -0,0 +1,111 @@
+import os
+import queue
+import multiprocessing
+from contextlib import redirect_stdout
+
+from Synthesizer import Synthesizer
+from wp import eval_conditions
+
+# Each variant is a set of keyword arguments for `Synthesizer.synth_program`, which only change how the job is searched
+DEFAULT_VARIANTS = [
+    {},
+    {"iterative_unroll": True},
+    {"initial_bound": 50, "random_seed": 1},
+    {"tactic": "qfnia", "random_seed": 2},
+]
+
+# The arguments of the job itself, which a variant may not change, since the result would depend on the variant
+JOB_ARGUMENTS = ("unroll_limit",)
+
+# Errors which hold for the job whichever variant raised them. Any other error (e.g. `Synthesizer.SolverUnknown`)
+# only means the variant couldn't decide, and the other variants are still waited for.
+DEFINITE_ERRORS = (Synthesizer.ProgramNotValid, Synthesizer.ProgramHasNoHoles, Synthesizer.ProgramHasInvalidVarName,
+                   Synthesizer.ProgramNotVerified)
+
+# How long to wait for a result before checking whether a variant died without one (seconds)
+POLL_INTERVAL = 0.1
+
+
+def run_variant(program, P_str, Q_str, linv_str, unroll_limit, variant, index, results, stop_event, debug = False):
+    """Runs a single CEGIS variant, and puts (index, program, error) on the `results` queue.
+    The conditions are given as strings, since lambdas can't be sent to another process."""
+    try:
+        P, Q, linv = eval_conditions(P_str, Q_str, linv_str)
+        options = {**variant, "unroll_limit": unroll_limit}
+
+        synth = Synthesizer(program)
+        if not debug:
+            with open(os.devnull, 'w') as f:
+                with redirect_stdout(f):
+                    result = synth.synth_program(program, P, Q, linv, should_stop = stop_event.is_set, **options)
+        else:
+            result = synth.synth_program(program, P, Q, linv, should_stop = stop_event.is_set, **options)
+        results.put((index, result, None))
+    except Exception as e:
+        results.put((index, None, e))
+
+
+def synth_program_portfolio(program, P_str = None, Q_str = None, linv_str = None, unroll_limit = 10, variants = None, max_workers = None, debug = False):
+    """
+    Synthesizes the holes of the program by running several CEGIS variants of the same job in parallel.
+    The variants may differ in unrolling strategy, initial holes bounds, Z3 random seed and tactic
+    (see `DEFAULT_VARIANTS`), but not in the arguments of the job (see `JOB_ARGUMENTS`).
+
+    Returns the program of the first variant which synthesizes one. The other variants are terminated, since
+    they would only notice the stop event between iterations, after their current Z3 query.
+    A variant which fails only decides the result if its error is definite (see `DEFINITE_ERRORS`), otherwise
+    the error of the first variant which failed is raised once all of them have.
+    """
+    if variants is None:
+        variants = DEFAULT_VARIANTS
+    for variant in variants:
+        if any(argument in variant for argument in JOB_ARGUMENTS):
+            raise ValueError(f"Variant {variant} changes an argument of the job ({', '.join(JOB_ARGUMENTS)})")
+    max_workers = max_workers or len(variants)
+
+    results = multiprocessing.Queue()
+    stop_event = multiprocessing.Event()
+    processes = [multiprocessing.Process(target = run_variant,
+                                         args = (program, P_str, Q_str, linv_str, unroll_limit, variant, index, results, stop_event, debug))
+                 for index, variant in enumerate(variants)]
+    waiting = list(range(len(processes)))
+    running = set()
+    # Variants seen dead before their result was read, which had one more poll to deliver it
+    exited = set()
+    first_error = None
+    try:
+        while waiting or running:
+            while waiting and len(running) < max_workers:
+                index = waiting.pop(0)
+                processes[index].start()
+                running.add(index)
+
+            try:
+                index, result, error = results.get(timeout = POLL_INTERVAL)
+            except queue.Empty:
+                for index in [index for index in running if not processes[index].is_alive()]:
+                    if index in exited:
+                        running.discard(index)
+                        if first_error is None:
+                            first_error = RuntimeError(f"Variant {variants[index]} exited with code {processes[index].exitcode}")
+                    exited.add(index)
+                continue
+
+            running.discard(index)
+            processes[index].join()
+            if error is None:
+                return result
+            if isinstance(error, DEFINITE_ERRORS):
+                raise error
+            if first_error is None:
+                first_error = error
+        raise first_error
+    finally:
+        stop_event.set()
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            if process.pid is not None:
+                process.join()
+        results.close()
+        results.join_thread()
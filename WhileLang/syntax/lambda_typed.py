@@ -1,7 +1,8 @@
 import typing
+import functools
 from functools import reduce
 
-from syntax.tree import Tree
+from syntax.tree import Tree, share
 from syntax.parsing.earley.earley import Grammar, Parser, ParseTrees
 from syntax.parsing.silly import SillyLexer
 
@@ -32,7 +33,7 @@ class LambdaParser:
 
     def __init__(self) -> None:
         self.tokenizer = SillyLexer(self.TOKENS)
-        self.grammar = Grammar.from_string(self.GRAMMAR)
+        self.grammar = Grammar.from_string(self.GRAMMAR).compile()
 
     def __call__(self, program_text: str) -> typing.Optional[Tree]:
         tokens = list(self.tokenizer(program_text))
@@ -41,9 +42,10 @@ class LambdaParser:
         earley.parse()
 
         if earley.is_valid_sentence():
+            # The grammar is ambiguous only where E1 and E1' both derive an E0,
+            # which postprocess makes the same, so any tree will do
             trees = ParseTrees(earley)
-            assert len(trees) == 1
-            return self.postprocess(trees.nodes[0])
+            return self.postprocess(trees.first())
         else:
             return None
 
@@ -78,13 +80,23 @@ class LambdaParser:
         return Tree(t.root, [self.postprocess(s) for s in t.subtrees])
 
 
+@functools.lru_cache(maxsize=None)
+def get_parser() -> LambdaParser:
+    """The parser of the module, built once"""
+    return LambdaParser()
+
+
+@functools.lru_cache(maxsize=256)
 def parse(program_text: str) -> Tree:
-    return LambdaParser()(program_text)
+    """Parses a typed lambda expression. The trees of recently parsed expressions are cached and
+    shared between the callers, so they must not be changed in place (see `syntax.tree.share`)."""
+    tree = get_parser()(program_text)
+    return share(tree) if tree is not None else None
 
 
 def parse_type(type_text: str) -> Tree:
     program_text = rf"\x: {type_text}. x"
-    return LambdaParser()(program_text).subtrees[0].subtrees[1]
+    return parse(program_text).subtrees[0].subtrees[1]
 
 
 def pretty(expr: Tree) -> str:
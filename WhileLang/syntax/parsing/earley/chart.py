@@ -1,7 +1,18 @@
 class Chart:
     def __init__(self, rows):
-        """An Earley chart is a list of rows for every input word"""
-        self.rows = rows
+        """An Earley chart is a list of rows for every input word.
+        The rows are also indexed by their (rule, dot, start), by the category
+        they wait for, and (when complete) by the category they completed"""
+        self.rows = []
+        self.keys = {}
+        self.waiting = {}
+        self.completed = {}
+        # Leo items of the chart, by the category they are waiting for (see `LeoItem`)
+        self.leo = {}
+        # Categories whose rules were already predicted in the chart
+        self.predicted = set()
+        for row in rows:
+            self.add_row(row)
 
     def __len__(self):
         """Chart length"""
@@ -15,9 +26,31 @@ class Chart:
         return st
 
     def add_row(self, row):
-        """Add a row to chart, only if wasn't already there"""
-        if row not in self.rows:
-            self.rows.append(row)
+        """Add a row to chart, only if wasn't already there.
+        If it was, the new derivation of the row is kept as an alternative of the existing one.
+        Returns True if the row was added"""
+        key = row.key()
+        existing = self.keys.get(key)
+        if existing is not None:
+            existing.add_alternative(row)
+            return False
+        self.keys[key] = row
+        self.rows.append(row)
+
+        next_cat = row.next_category()
+        if next_cat is None:
+            self.completed.setdefault(row.rule.lhs, []).append(row)
+        else:
+            self.waiting.setdefault(next_cat, []).append(row)
+        return True
+
+    def waiting_for(self, category):
+        """Rows whose next category is the given one"""
+        return self.waiting.get(category, ())
+
+    def completed_from(self, category, start):
+        """Complete rows of the given category which start at the given chart"""
+        return [row for row in self.completed.get(category, ()) if row.start == start]
 
 
 class ChartRow:
@@ -28,8 +61,32 @@ class ChartRow:
         self.rule = rule
         self.dot = dot
         self.start = start
-        self.completing = completing
+        self._completing = completing
         self.previous = previous
+        # Other derivations of the same item: rows with the same key, but different
+        # previous or completing rows (see `Chart.add_row`)
+        self.alternatives = []
+
+    @property
+    def completing(self):
+        """The complete row this row was promoted by. Rows which were completed
+        through a Leo item build the rows they skipped on first access"""
+        if isinstance(self._completing, LeoCompletion):
+            self._completing = self._completing.materialize()
+        return self._completing
+
+    def derivations(self):
+        """The rows of all the derivations of this item, this row's first"""
+        return [self] + self.alternatives
+
+    def add_alternative(self, row):
+        """Keep another derivation of this item, unless it has no parents or is already known"""
+        if row.previous is None and row._completing is None:
+            return
+        for known in self.derivations():
+            if known.previous is row.previous and known._completing is row._completing:
+                return
+        self.alternatives.append(row)
 
     def __len__(self):
         """A chart's length is its rule's length"""
@@ -45,6 +102,13 @@ class ChartRow:
             rule_str, self.start, self.completing, self.previous
         )
 
+    def key(self):
+        """Rows with the same rule, dot and start are the same chart item"""
+        return (self.rule, self.dot, self.start)
+
+    def __hash__(self):
+        return hash(self.key())
+
     def __eq__(self, other):
         """Two rows are equal if they share the same rule, start and dot"""
         if len(self) == len(other):
@@ -69,3 +133,36 @@ class ChartRow:
         if self.dot > 0:
             return self.rule[self.dot - 1]
         return None
+
+
+class LeoItem:
+    def __init__(self, row, above=None):
+        """A deterministic reduction path (Leo's optimisation): `row` is the only
+        row of its chart which waits for a category, and it is its last category.
+        Completing the category there completes `row` too, and so on up the path.
+        `above` is the Leo item of the category `row` completes, if it has one"""
+        self.row = row
+        self.above = above
+        self.top = above.top if above else row
+
+    def complete(self, completing):
+        """The row at the top of the path, completed by the `completing` row"""
+        top = self.top
+        return ChartRow(top.rule, top.dot + 1, top.start, top, LeoCompletion(self, completing))
+
+
+class LeoCompletion:
+    def __init__(self, item, completing):
+        """The rows a Leo item skipped, to be built only when the parse tree needs them"""
+        self.item = item
+        self.completing = completing
+
+    def materialize(self):
+        """Completes the rows of the path from the bottom up to the row below the top,
+        and returns the last of them"""
+        item, completing = self.item, self.completing
+        while item.row is not item.top:
+            row = item.row
+            completing = ChartRow(row.rule, row.dot + 1, row.start, row, completing)
+            item = item.above
+        return completing
@@ -6,6 +6,7 @@ class Rule:
         """Initializes grammar rule: LHS -> [RHS]"""
         self.lhs = lhs
         self.rhs = rhs
+        self._hash = None
 
     def __len__(self):
         """A rule's length is its RHS's length"""
@@ -19,8 +20,16 @@ class Rule:
         """Return a member of the RHS"""
         return self.rhs[item]
 
+    def __hash__(self):
+        """Hash of both sides, computed once (rules aren't changed after they are built)"""
+        if self._hash is None:
+            self._hash = hash((self.lhs, tuple(self.rhs)))
+        return self._hash
+
     def __eq__(self, other):
         """Rules are equal iff both their sides are equal"""
+        if self is other:
+            return True
         if self.lhs == other.lhs:
             if self.rhs == other.rhs:
                 return True
@@ -60,6 +69,10 @@ class Grammar:
         if self.start_symbol is None:
             self.start_symbol = lhs
 
+    def compile(self):
+        """Returns an immutable copy of the grammar, ready for parsing"""
+        return CompiledGrammar(self)
+
     @staticmethod
     def from_file(filename):
         """Returns a Grammar instance created from a text file."""
@@ -98,3 +111,55 @@ class Grammar:
                 grammar.add_rule(r)
 
         return grammar
+
+
+class CompiledGrammar:
+    def __init__(self, grammar):
+        """An immutable grammar with the sets the parser needs precomputed:
+        the nullable categories, and for every category the rules predicted
+        by it (directly or through the first symbols of predicted rules)"""
+        self.rules = {lhs: tuple(rules) for lhs, rules in grammar.rules.items()}
+        self.start_symbol = grammar.start_symbol
+        self.nullable = self._nullable()
+        self.predictions = {lhs: self._predict(lhs) for lhs in self.rules}
+
+    def __repr__(self):
+        """Nice string representation"""
+        st = "<Grammar>\n"
+        for group in self.rules.values():
+            for rule in group:
+                st += "\t{0}\n".format(str(rule))
+        st += "</Grammar>"
+        return st
+
+    def __getitem__(self, lhs):
+        """Return rules for a given LHS"""
+        return self.rules.get(lhs)
+
+    def compile(self):
+        return self
+
+    def _nullable(self):
+        nullable = set()
+        changed = True
+        while changed:
+            changed = False
+            for lhs, rules in self.rules.items():
+                if lhs not in nullable and any(all(s in nullable for s in rule.rhs) for rule in rules):
+                    nullable.add(lhs)
+                    changed = True
+        return frozenset(nullable)
+
+    def _predict(self, category):
+        """The categories predicted by a category, and their rules"""
+        categories = [category]
+        seen = {category}
+        for cat in categories:
+            for rule in self.rules.get(cat, ()):
+                for symbol in rule.rhs:
+                    if symbol in self.rules and symbol not in seen:
+                        seen.add(symbol)
+                        categories.append(symbol)
+                    if symbol not in self.nullable:
+                        break
+        return frozenset(categories), tuple(rule for cat in categories for rule in self.rules.get(cat, ()))
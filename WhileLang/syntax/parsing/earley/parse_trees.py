@@ -1,50 +1,145 @@
+import itertools
+
 from syntax.tree import Tree
 
 
 class ParseTrees:
     def __init__(self, parser):
-        """Initialize a syntax tree parsing process"""
+        """The parse trees of a parsed sentence, as a shared packed parse forest:
+        every chart row is a node, shared by all the trees it is part of, and keeps
+        every derivation it was found by (see `ChartRow.derivations`).
+        Trees are only built when they are asked for"""
         self.parser = parser
         self.charts = parser.charts
         self.length = len(parser)
-
-        self.nodes = []
-        for root in parser.complete_parses:
-            self.nodes.extend(self.build_nodes(root))
+        self.roots = parser.complete_parses
+        self._nodes = None
 
     def __len__(self):
-        """Trees count"""
-        return len(self.nodes)
+        """Trees count, without building them"""
+        counts = {}
+        return sum(self.count(root, counts) for root in self.roots)
+
+    def __iter__(self):
+        """Builds the trees one by one"""
+        for root in self.roots:
+            # Every tree is a list of choices, one for each ambiguous row met while building it
+            pending = [()]
+            while pending:
+                choices = pending.pop()
+                tree, options = self.build(root, choices)
+                if tree is not None:
+                    yield tree
+                else:
+                    pending.extend(choices + (i,) for i in reversed(range(options)))
+
+    @property
+    def nodes(self):
+        """All the trees"""
+        if self._nodes is None:
+            self._nodes = list(self)
+        return self._nodes
 
     def __repr__(self):
         """String representation of a list of trees with indexes"""
         return "<Parse Trees>\n{0}</Parse Trees>".format(
             "\n".join(
                 "Parse tree #{0}:\n{1}\n\n".format(i + 1, str(self.nodes[i]))
-                for i in range(len(self))
+                for i in range(len(self.nodes))
             )
         )
 
-    def build_nodes(self, root):
-        """Recursively create subtree for given parse chart row"""
-        # find subtrees of current symbol
-        if root.completing:
-            down = self.build_nodes(root.completing)
-        elif root.dot > 0:
-            down = [Tree(root.prev_category())]
-        else:
-            down = []
-
-        # prepend subtrees of previous symbols
-        prev = root.previous
-        left = []
-        if prev:
-            left[:0] = [x.subtrees for x in self.build_nodes(prev)]
-            prev = prev.previous
-        else:
-            left = [[]]
-
-        for x in left:
-            x.extend(down)
-
-        return [Tree(root.rule.lhs, subtrees) for subtrees in left]
+    def first(self):
+        """The tree of the first derivation of every row, which is the first one the parser found"""
+        if not self.roots:
+            return None
+        tree, _ = self.build(self.roots[0], itertools.repeat(0))
+        return tree
+
+    def is_ambiguous(self):
+        """Returns true if there is more than one tree, by looking for a row with
+        several derivations in the first tree only"""
+        if len(self.roots) > 1:
+            return True
+        seen = set()
+        stack = list(self.roots)
+        while stack:
+            row = stack.pop()
+            if id(row) in seen:
+                continue
+            seen.add(id(row))
+            if row.alternatives:
+                return True
+            for parent in (row.previous, row.completing):
+                if parent is not None:
+                    stack.append(parent)
+        return False
+
+    def build(self, root, choices):
+        """Iteratively builds the tree of a root row, deriving each ambiguous row met
+        by the next choice. Returns the tree and None, or None and the number of
+        derivations of the first ambiguous row there is no choice for.
+        Derivations which contain their own row are cut, with 0 derivations"""
+        choices = iter(choices)
+        tree = Tree(root.rule.lhs, [])
+        # The rows to build, their trees, and the ambiguous rows they are part of
+        stack = [(root, tree, None)]
+        while stack:
+            row, node, above = stack.pop()
+            # Walk back through the previous rows, from the last category of the rule to the first
+            while row is not None and row.dot > 0:
+                derivations = row.derivations()
+                if len(derivations) > 1:
+                    choice = next(choices, None)
+                    if choice is None:
+                        return None, len(derivations)
+                    if self._is_above(row, above):
+                        return None, 0
+                    above = (row, above)
+                    row = derivations[choice]
+
+                completing = row.completing
+                if completing is None:
+                    node.subtrees.append(Tree(row.prev_category()))
+                else:
+                    subtree = Tree(completing.rule.lhs, [])
+                    node.subtrees.append(subtree)
+                    stack.append((completing, subtree, above))
+                row = row.previous
+            node.subtrees.reverse()
+        return tree, None
+
+    @staticmethod
+    def _is_above(row, above):
+        while above is not None:
+            if above[0] is row:
+                return True
+            above = above[1]
+        return False
+
+    def count(self, root, counts):
+        """Iteratively counts the trees of a row. `counts` keeps the counts of the
+        rows by id, and is shared between calls. Derivations which contain their own row aren't counted"""
+        stack = [(root, False)]
+        while stack:
+            row, ready = stack.pop()
+            if not ready:
+                if id(row) in counts:
+                    continue
+                counts[id(row)] = None
+                stack.append((row, True))
+                for derivation in row.derivations():
+                    for parent in (derivation.previous, derivation.completing):
+                        if parent is not None and id(parent) not in counts:
+                            stack.append((parent, False))
+            else:
+                total = 0
+                for derivation in row.derivations():
+                    # A row still being counted is a cycle
+                    product = 1
+                    for parent in (derivation.previous, derivation.completing):
+                        if parent is not None:
+                            product *= counts[id(parent)] or 0
+                    total += product
+                counts[id(row)] = total
+        return counts[id(root)]
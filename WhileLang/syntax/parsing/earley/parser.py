@@ -8,7 +8,7 @@ class Parser:
 
     def __init__(self, grammar, sentence, debug=False):
         """Initialize parser with grammar and sentence"""
-        self.grammar = grammar
+        self.grammar = grammar.compile()
         self.sentence = (
             sentence if isinstance(sentence, Sentence) else Sentence(sentence)
         )
@@ -38,27 +38,49 @@ class Parser:
             for rule in rules:
                 chart.add_row(ChartRow(rule, 1, position - 1))
 
-    def predict(self, chart, position):
+    def predict(self, chart, position, row):
         """Predict next parse by looking up grammar rules
-        for pending categories in current chart"""
-        for row in chart.rows:
-            next_cat = row.next_category()
-            rules = self.grammar[next_cat]
-            if rules:
-                for rule in rules:
-                    new = ChartRow(rule, 0, position)
-                    chart.add_row(new)
-
-    def complete(self, chart, position):
+        for the category the row is pending on"""
+        next_cat = row.next_category()
+        if next_cat not in chart.predicted and next_cat in self.grammar.predictions:
+            # Predict the rules of every category the prediction leads to at once
+            categories, rules = self.grammar.predictions[next_cat]
+            chart.predicted.update(categories)
+            for rule in rules:
+                new = ChartRow(rule, 0, position)
+                chart.add_row(new)
+
+        # The category may have been completed empty in this chart before the row was added
+        if next_cat in self.grammar.nullable:
+            for completed in chart.completed_from(next_cat, position):
+                chart.add_row(ChartRow(row.rule, row.dot + 1, row.start, row, completed))
+
+    def leo_item(self, position, category):
+        """The Leo item of a category in a chart, or None if completing the category
+        there isn't deterministic. Only charts which are done may be asked"""
+        chart = self.charts[position]
+        if category not in chart.leo:
+            # Marked first, so cycles of unit rules end the path
+            chart.leo[category] = None
+            waiting = chart.waiting_for(category)
+            if len(waiting) == 1 and waiting[0].dot + 1 == len(waiting[0]):
+                row = waiting[0]
+                chart.leo[category] = LeoItem(row, self.leo_item(row.start, row.rule.lhs))
+        return chart.leo[category]
+
+    def complete(self, chart, position, row):
         """Complete a rule that was done parsing, and
-        promote previously pending rules"""
-        for row in chart.rows:
-            if row.is_complete():
-                completed = row.rule.lhs
-                for r in self.charts[row.start].rows:
-                    if completed == r.next_category():
-                        new = ChartRow(r.rule, r.dot + 1, r.start, r, row)
-                        chart.add_row(new)
+        promote the rows that were pending on it"""
+        completed = row.rule.lhs
+        if row.start != position:
+            leo = self.leo_item(row.start, completed)
+            if leo is not None:
+                chart.add_row(leo.complete(row))
+                return
+
+        for r in list(self.charts[row.start].waiting_for(completed)):
+            new = ChartRow(r.rule, r.dot + 1, r.start, r, row)
+            chart.add_row(new)
 
     def parse(self):
         """Main Earley's Parser loop"""
@@ -70,16 +92,16 @@ class Parser:
             chart = self.charts[i]
             self.prescan(chart, i)  # scan current input
 
-            # predict & complete loop
-            # rinse & repeat until chart stops changing
-            length = len(chart)
-            old_length = -1
-            while old_length != length:
-                self.predict(chart, i)
-                self.complete(chart, i)
-
-                old_length = length
-                length = len(chart)
+            # predict & complete each row once, in the order the rows were added,
+            # so the rows of the chart serve as the worklist
+            j = 0
+            while j < len(chart):
+                row = chart.rows[j]
+                if row.is_complete():
+                    self.complete(chart, i, row)
+                else:
+                    self.predict(chart, i, row)
+                j += 1
 
             i += 1
 
@@ -1,5 +1,11 @@
+import weakref
+
+
 class Tree:
 
+    # Trees are many and small, so they have no __dict__. Paths keep weak references to them
+    __slots__ = ("root", "subtrees", "__weakref__")
+
     def __init__(self, root, subtrees=None):
         self.root = root
         if subtrees is None:
@@ -39,7 +45,10 @@ class Tree:
 
     @classmethod
     def reconstruct(cls, t):
-        return cls(t.root, [cls.reconstruct(s) for s in t.subtrees])
+        built = {}
+        for n in PostorderWalk(t):
+            built[id(n)] = cls(n.root, [built[id(s)] for s in n.subtrees])
+        return built[id(t)]
 
     @property
     def nodes(self):
@@ -52,7 +61,7 @@ class Tree:
     @property
     def terminals(self):
         """@return a list of the values located at the leaf nodes."""
-        return [n.root for n in self.leaves]
+        return [n.root for n in PreorderWalk(self) if not n.subtrees]
 
     @property
     def depth(self):
@@ -60,9 +69,9 @@ class Tree:
         stack = [(0, self)]
         max_depth = 0
         while stack:
-            depth, top = stack[0]
+            depth, top = stack.pop()
             max_depth = max(depth, max_depth)
-            stack[:1] = [(depth + 1, x) for x in top.subtrees]
+            stack.extend((depth + 1, x) for x in top.subtrees)
         return max_depth
 
     def split(self, separator=None):
@@ -74,7 +83,89 @@ class Tree:
             return [self]
 
 
+class InternedTree(Tree):
+    """
+    A hash-consed tree: structurally equal interned trees are the same object, so they
+    are compared in O(1), and the hash of each is computed once, from the hashes of its subtrees.
+    The subtrees are interned as well, so a tree with repeated subtrees is stored as a DAG.
+    Roots must be hashable, and interned trees must not be changed in place.
+    """
+
+    __slots__ = ("_hash",)
+
+    # Alive interned trees, by (class, root type, root, ids of subtrees)
+    _table = weakref.WeakValueDictionary()
+
+    def __new__(cls, root, subtrees=None):
+        subtrees = [s if isinstance(s, InternedTree) else cls.intern(s) for s in subtrees or []]
+        key = (cls, type(root), root, tuple(id(s) for s in subtrees))
+        tree = cls._table.get(key)
+        if tree is None:
+            tree = super().__new__(cls)
+            tree.root = root
+            tree.subtrees = subtrees
+            tree._hash = hash((root, tuple(s._hash for s in subtrees)))
+            cls._table[key] = tree
+        return tree
+
+    def __init__(self, root, subtrees=None):
+        # Everything was set by __new__, and an existing tree must not be reset
+        pass
+
+    def __eq__(self, other):
+        if isinstance(other, InternedTree):
+            return self is other
+        return super().__eq__(other)
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        return (type(self), (self.root, self.subtrees))
+
+    @classmethod
+    def intern(cls, tree):
+        """The interned tree structurally equal to the given tree (built without recursion)"""
+        if isinstance(tree, cls):
+            return tree
+        interned = {}
+        stack = [(tree, False)]
+        while stack:
+            t, ready = stack.pop()
+            if id(t) in interned:
+                continue
+            if ready:
+                interned[id(t)] = cls(t.root, [interned[id(s)] for s in t.subtrees])
+            else:
+                stack.append((t, True))
+                stack.extend((s, False) for s in t.subtrees if id(s) not in interned)
+        return interned[id(tree)]
+
+
+# Trees which are shared between their users, such as cached parse results, by id
+_shared = weakref.WeakValueDictionary()
+
+
+def share(tree):
+    """
+    Marks a tree as shared, so the in-place operations refuse to change it (see `check_not_shared`).
+    Only the tree itself is marked, but its subtrees are shared as well and must not be changed either.
+    """
+    _shared[id(tree)] = tree
+    return tree
+
+
+def is_shared(tree):
+    return _shared.get(id(tree)) is tree
+
+
+def check_not_shared(tree):
+    """Raises ValueError for a shared tree, which must be cloned before it is changed in place"""
+    if is_shared(tree):
+        raise ValueError("the tree is shared (e.g. a cached parse result), so change a clone() of it instead")
+
+
 # @deprecated: clients should use .tree.walk.RichTreeWalk instead
-from .walk import PreorderWalk, RichTreeWalk as Walk
+from .walk import PreorderWalk, PostorderWalk, RichTreeWalk as Walk
 
 Visitor = Walk.Visitor
@@ -0,0 +1,131 @@
+"""
+A compact representation for large trees: the nodes are stored in preorder in two
+parallel arrays, the roots and the index where the subtree of each node ends.
+The children of node `i` are `i + 1`, then `ends[i + 1]`, and so on until `ends[i]`.
+
+This is an optional representation, for holding a large tree with fewer objects: the
+parsers and transformations build and change pointer `Tree`s, so a flat tree is read through
+node views which are made as they are visited (and not kept), or converted with `to_tree`.
+"""
+
+from array import array
+from collections.abc import Sequence
+
+from syntax.tree import Tree
+
+
+class FlatTree:
+
+    __slots__ = ("roots", "ends")
+
+    def __init__(self, roots, ends):
+        self.roots = roots
+        self.ends = ends
+
+    @classmethod
+    def from_tree(cls, tree):
+        """Flattens a tree (without recursion)"""
+        roots = []
+        ends = array("l")
+        stack = [(tree, False, 0)]
+        while stack:
+            node, done, index = stack.pop()
+            if done:
+                ends[index] = len(roots)
+            else:
+                index = len(roots)
+                roots.append(node.root)
+                ends.append(0)
+                stack.append((node, True, index))
+                stack.extend((s, False, 0) for s in reversed(node.subtrees))
+        return cls(roots, ends)
+
+    def __len__(self):
+        """Nodes count"""
+        return len(self.roots)
+
+    def children(self, index):
+        """The indexes of the children of a node"""
+        child = index + 1
+        end = self.ends[index]
+        while child < end:
+            yield child
+            child = self.ends[child]
+
+    def node(self, index=0):
+        """A view of a node with the `Tree` API (a new one on each call)"""
+        return FlatNode(self, index)
+
+    @property
+    def tree(self):
+        """A view of the root node with the `Tree` API"""
+        return self.node(0)
+
+    def to_tree(self):
+        """Builds the equal `Tree` (without recursion)"""
+        trees = [None] * len(self)
+        for index in reversed(range(len(self))):
+            trees[index] = Tree(self.roots[index], [trees[child] for child in self.children(index)])
+        return trees[0]
+
+
+class FlatNode(Tree):
+    """
+    A node of a `FlatTree`, which reads its root and subtrees from the arrays.
+    It can be passed where a `Tree` is read, but not changed. Views of the same node are equal,
+    but not the same object.
+    """
+
+    __slots__ = ("flat", "index")
+
+    def __init__(self, flat, index):
+        self.flat = flat
+        self.index = index
+
+    @property
+    def root(self):
+        return self.flat.roots[self.index]
+
+    @property
+    def subtrees(self):
+        return FlatChildren(self.flat, self.index)
+
+
+class FlatChildren(Sequence):
+    """The subtrees of a `FlatNode`, as views which are made when they are iterated over"""
+
+    __slots__ = ("flat", "index")
+
+    def __init__(self, flat, index):
+        self.flat = flat
+        self.index = index
+
+    def __iter__(self):
+        for child in self.flat.children(self.index):
+            yield FlatNode(self.flat, child)
+
+    def __len__(self):
+        return sum(1 for _ in self.flat.children(self.index))
+
+    def __bool__(self):
+        return self.flat.ends[self.index] > self.index + 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self)[i]
+        if i < 0:
+            i += len(self)
+        for position, child in enumerate(self.flat.children(self.index)):
+            if position == i:
+                return FlatNode(self.flat, child)
+        raise IndexError("subtree index out of range")
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
@@ -27,9 +27,12 @@ class Path(list):
             cont = Path(cont)
         return super(Path, self).__iadd__(cont)
 
-    def __getitem__(self, k: int | slice) -> "Path":
+    def __getitem__(self, k: int | slice):
+        """A slice is a Path, and an index is the weak reference to the node there"""
+        if not isinstance(k, slice):
+            return super().__getitem__(k)
         p = Path()
-        p.extend(super()[k])
+        p.extend(super().__getitem__(k))
         return p
 
     def up(self):
@@ -51,3 +54,56 @@ class Path(list):
 
     def __repr__(self):
         return " -> ".join(repr(x()) for x in self)
+
+
+class LinkedPath:
+    """
+    A path from the root, kept as its last node and a pointer to the path of the node's parent.
+    Paths which share a prefix share its links, so extending a path is O(1).
+    It reads like a `Path`, and `to_path` makes one.
+    """
+
+    __slots__ = ("end", "parent", "length")
+
+    def __init__(self, end, parent=None):
+        self.end = end
+        self.parent = parent
+        self.length = parent.length + 1 if parent is not None else 1
+
+    def __len__(self):
+        return self.length
+
+    def __add__(self, cont):
+        path = self
+        for node in cont:
+            path = LinkedPath(node, path)
+        return path
+
+    def nodes(self):
+        """The nodes of the path, from the root"""
+        nodes = []
+        link = self
+        while link is not None:
+            nodes.append(link.end)
+            link = link.parent
+        nodes.reverse()
+        return nodes
+
+    @property
+    def start(self):
+        link = self
+        while link.parent is not None:
+            link = link.parent
+        return link.end
+
+    def node_at(self, i):
+        return self.nodes()[i]
+
+    def up(self):
+        return self.parent
+
+    def to_path(self):
+        return Path(self.nodes())
+
+    def __repr__(self):
+        return " -> ".join(repr(x) for x in self.nodes())
@@ -1,28 +1,15 @@
-from syntax.tree.paths import Path
-from syntax.tree.walk import RichTreeWalk
+from syntax.tree.paths import LinkedPath
 
 
 class ScanFor:
-
-    class Visitor(RichTreeWalk.Visitor):
-        def __init__(self, criterion, applies_to):
-            self.criterion = criterion
-            self.applies_to = applies_to
-            self.path = Path()
-            self.collect = []
-
-        def enter(self, node, prune):
-            self.path = self.path + [node]
-            if self.criterion(self.applies_to(self.path)):
-                self.collect.append(self.path)
-
-        def leave(self, node):
-            self.path = self.path.up()
-
-        def done(self, root, final):
-            return self.collect
-
-    PATH = lambda path: path
+    """
+    Finds the nodes of a tree which satisfy a criterion, in preorder.
+    The criterion is applied to the node, its value, or its path from the root (see `applies_to`).
+    The paths are `LinkedPath`s while scanning, and only those of the matches are made `Path`s,
+    unless the criterion applies to the path, which is then given as a `Path` (of weak references).
+    """
+
+    PATH = lambda path: path.to_path()
     NODE = lambda path: path.end
     VALUE = lambda path: path.end.root
 
@@ -31,8 +18,16 @@ class ScanFor:
         self.applies_to = applies_to
 
     def __call__(self, tree):
-        visitor = self.Visitor(self.criterion, self.applies_to)
-        return RichTreeWalk(visitor)(tree)
+        return list(self.scan(tree))
+
+    def scan(self, tree):
+        """Lazily yields the path of each match"""
+        stack = [LinkedPath(tree)]
+        while stack:
+            path = stack.pop()
+            if self.criterion(self.applies_to(path)):
+                yield path.to_path()
+            stack.extend(LinkedPath(sub, path) for sub in reversed(path.end.subtrees))
 
     PATH = staticmethod(PATH)
     NODE = staticmethod(NODE)
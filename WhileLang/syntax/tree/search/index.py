@@ -0,0 +1,156 @@
+from syntax.tree.search.pattern import (
+    TreePattern,
+    TreeTopPattern,
+    TreeRootPattern,
+    ConditionalPattern,
+)
+
+
+class PatternIndex:
+    """
+    Matches a tree against many patterns at once, with a discrimination tree:
+    a trie over the templates of the patterns in preorder, where each node of a template is a key -
+    its root and number of subtrees, any root (`?x`) and number of subtrees, or any subtree (`$x`).
+    Matching descends the trie once along the tree, so it only reaches the patterns which may match.
+
+    Plain `TreeTopPattern`s are matched by the descent itself, and their groups are collected on the way.
+    Conditional and root patterns are only filtered by it, and patterns with ellipses (`$x...`) or of
+    other kinds - including subclasses, which may match differently - are always tried, with their own `match`.
+    """
+
+    WILD = ("$",)
+
+    class Node:
+        __slots__ = ("edges", "entries")
+
+        def __init__(self):
+            self.edges = {}
+            # (order, pattern, value, names of the placeholders, or None if the pattern checks the match)
+            self.entries = []
+
+    def __init__(self, patterns=()):
+        """Indexes (pattern, value) pairs, or patterns whose value is themselves"""
+        self.root = self.Node()
+        self.unindexed = []
+        self.count = 0
+        for item in patterns:
+            if isinstance(item, tuple):
+                self.add(*item)
+            else:
+                self.add(item)
+
+    def __len__(self):
+        return self.count
+
+    def add(self, pattern, value=None):
+        """Adds a pattern, which `match` returns with the given value (or the pattern itself)"""
+        if value is None:
+            value = pattern
+        order = self.count
+        self.count += 1
+
+        keys = self.keys(pattern)
+        if keys is None:
+            self.unindexed.append((order, pattern, value))
+            return
+        keys, names = keys
+
+        node = self.root
+        for key in keys:
+            node = node.edges.setdefault(key, self.Node())
+        node.entries.append((order, pattern, value, names))
+
+    @classmethod
+    def keys(cls, pattern):
+        """
+        The keys of a pattern in the trie, and the names of its placeholders in preorder
+        (or None if the pattern checks its matches itself). Returns None if it can't be indexed.
+        """
+        if type(pattern) is ConditionalPattern and isinstance(pattern.pattern, TreePattern):
+            keys = cls.keys(pattern.pattern)
+            return (keys[0], None) if keys is not None else None
+
+        if type(pattern) is TreeRootPattern and pattern.fan is not None:
+            return [("lit", pattern.symbol, pattern.fan)] + [cls.WILD] * pattern.fan, None
+
+        # Subclasses may match scalars or placeholders differently
+        if type(pattern) is not TreeTopPattern:
+            return None
+
+        keys, names = [], []
+        stack = [pattern.template]
+        while stack:
+            t = stack.pop()
+            r = t.root
+            if pattern._is_subtree_placeholder(r):
+                keys.append(cls.WILD)
+                names.append(r)
+                continue
+            if any(pattern._is_subtrees_placeholder(s.root) for s in t.subtrees):
+                return None
+            if pattern._is_node_placeholder(r):
+                keys.append(("any", len(t.subtrees)))
+                names.append(r)
+            else:
+                try:
+                    hash(r)
+                except TypeError:
+                    return None
+                keys.append(("lit", r, len(t.subtrees)))
+            stack.extend(reversed(t.subtrees))
+        return keys, names
+
+    def match(self, tree):
+        """The (value, match object) of every pattern which matches the root of the tree, in the order they were added"""
+        found = []
+        for order, pattern, value in self.unindexed:
+            mo = pattern.match(tree)
+            if mo is not None:
+                found.append((order, value, mo))
+
+        # The subtrees left to match and the groups collected are linked lists, shared by the branches of the descent
+        work = [(self.root, (tree, None), None)]
+        while work:
+            node, pending, captured = work.pop()
+            if pending is None:
+                if node.entries:
+                    self._collect(node, tree, captured, found)
+                continue
+
+            text, rest = pending
+            edges = node.edges
+            child = edges.get(self.WILD)
+            if child is not None:
+                work.append((child, rest, (text, captured)))
+
+            arity = len(text.subtrees)
+            below = rest
+            for sub in reversed(text.subtrees):
+                below = (sub, below)
+            child = edges.get(("any", arity))
+            if child is not None:
+                work.append((child, below, (text.root, captured)))
+            try:
+                child = edges.get(("lit", text.root, arity))
+            except TypeError:
+                child = None
+            if child is not None:
+                work.append((child, below, captured))
+
+        found.sort(key=lambda x: x[0])
+        return [(value, mo) for _, value, mo in found]
+
+    @staticmethod
+    def _collect(node, tree, captured, found):
+        groups = []
+        while captured is not None:
+            groups.append(captured[0])
+            captured = captured[1]
+        groups.reverse()
+        for order, pattern, value, names in node.entries:
+            if names is None:
+                mo = pattern.match(tree)
+            else:
+                mo = pattern.MatchObject(tree, dict(zip(names, groups)))
+            if mo is not None:
+                found.append((order, value, mo))
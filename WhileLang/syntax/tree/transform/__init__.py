@@ -1,5 +1,7 @@
 import copy
 
+from syntax.tree import check_not_shared
+
 
 class TreeTransform:
 
@@ -28,8 +30,7 @@ class TreeTransform:
 
         def at_root(tree, cont):
             root = tree.root
-            for transformer in self.transformers:
-                tree_tag = transformer(tree)
+            for transformer, tree_tag in self._transform(tree):
                 if tree_tag is not None:
                     if isinstance(tree_tag, self.Scalar):
                         root = tree_tag.value
@@ -61,12 +62,13 @@ class TreeTransform:
         @return the same tree, if the root is unchanged; otherwise it's a new
           tree. In the former case, inner nodes of the original instance are
           transformed as specified.
+        @raise ValueError: if the tree is shared (see `syntax.tree.share`)
         """
+        check_not_shared(tree)
         dif = out_diff.append if out_diff is not None else lambda x: None
 
         def at_root(tree):
-            for transformer in self.transformers:
-                tree_tag = transformer(tree)
+            for transformer, tree_tag in self._transform(tree):
                 if tree_tag is not None:
                     if isinstance(tree_tag, self.Scalar):
                         dif((tree.root, tree_tag.value))
@@ -105,13 +107,24 @@ class TreeTransform:
             else:
                 return x
 
+    def _transform(self, tree):
+        """
+        Lazily applies the transformers to the tree in order, yielding each with its result.
+        Subclasses may skip the transformers which can't apply to the tree.
+        """
+        for transformer in self.transformers:
+            yield transformer, transformer(tree)
+
     def flatten(self, ltrees):
-        i = 0
-        while i < len(ltrees):
-            if ltrees[i].root == []:
-                ltrees[i : i + 1] = ltrees[i].subtrees
-            else:
-                i += 1
+        """Splices the subtrees of the trees rooted by `[]` in their place (in-place, in one pass)"""
+        if any(t.root == [] for t in ltrees):
+            spliced = []
+            for t in ltrees:
+                if t.root == []:
+                    spliced.extend(self.flatten(list(t.subtrees)))
+                else:
+                    spliced.append(t)
+            ltrees[:] = spliced
         return ltrees
 
     def scalar_transform(self, scalar):
@@ -129,8 +142,9 @@ class TreeTransform:
             if self.recurse:
                 tree = rerun(self, tree, descent=True)
             else:
-                # continue by applying other transformers
-                tree.subtrees = [rerun(self, x) for x in tree.subtrees]
+                # continue by applying other transformers (in a new node, since the
+                # replacement may reuse subtrees of a shared tree)
+                tree = type(tree)(tree.root, [rerun(self, x) for x in tree.subtrees])
                 tree = rerun(self._except(last_transformer), tree, descent=False)
         return tree
 
@@ -1,3 +1,4 @@
+from syntax.tree import check_not_shared
 from syntax.tree.walk import PreorderWalk
 
 
@@ -7,14 +8,27 @@ class ApplyTo:
         self.noperation = nodes
 
     def inplace(self, tree):
+        check_not_shared(tree)
         for node in PreorderWalk(tree):
             node.root = self.noperation(node.root)
         return tree
 
     def asnew(self, tree):
-        root = self.noperation(tree.root)
-        subtrees = [self.asnew(s) for s in tree.subtrees]
-        return type(tree)(root, subtrees)
+        # The roots are mapped on the way down, and the new nodes are built on the way up
+        DOWN, UP = 0, 1
+        stack = [(DOWN, tree, None)]
+        built = []
+        while stack:
+            direction, node, root = stack.pop()
+            if direction == DOWN:
+                stack.append((UP, node, self.noperation(node.root)))
+                stack.extend((DOWN, s, None) for s in reversed(node.subtrees))
+            else:
+                first = len(built) - len(node.subtrees)
+                subtrees = built[first:]
+                del built[first:]
+                built.append(type(node)(root, subtrees))
+        return built[0]
 
     def __call__(self, tree):
         return self.asnew(tree)
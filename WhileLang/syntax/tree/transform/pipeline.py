@@ -0,0 +1,92 @@
+from syntax.tree.transform import TreeTransform
+
+
+class RewritePipeline:
+    """
+    Applies several `TreeTransform`s together until none of them changes the tree.
+
+    The tree is normalized bottom-up in a single traversal: each node is rewritten by the first
+    transformer (of the transforms in order) which applies to it, after its subtrees were normalized.
+    When a node is rewritten, only the new parts of its replacement are visited again - the
+    subtrees it reuses are already known to be normal. Nodes whose subtrees didn't change are
+    kept as they are, so a tree nothing applies to is returned as is.
+    Subtrees rooted by `[]` are spliced into their parents, like in `TreeTransform.flatten`.
+    """
+
+    def __init__(self, transforms, max_rewrites=None):
+        """
+        @param transforms: TreeTransform instances, tried in order at each node
+        @param max_rewrites: raise RuntimeError after this many rewrites, in case the rules don't terminate
+        """
+        self.transforms = list(transforms)
+        self.max_rewrites = max_rewrites
+
+    def __call__(self, tree):
+        DOWN, UP = 0, 1
+        # The nodes known to be normal, by id (the values keep them alive)
+        normal = {}
+        rewrites = 0
+        done = []
+        stack = [(DOWN, tree)]
+        while stack:
+            direction, node = stack.pop()
+            if direction == DOWN:
+                if id(node) in normal:
+                    done.append(node)
+                else:
+                    stack.append((UP, node))
+                    stack.extend((DOWN, s) for s in reversed(node.subtrees))
+                continue
+
+            first = len(done) - len(node.subtrees)
+            subtrees = self.splice(done[first:])
+            del done[first:]
+            if len(subtrees) != len(node.subtrees) or any(
+                a is not b for a, b in zip(subtrees, node.subtrees)
+            ):
+                node = type(node)(node.root, subtrees)
+
+            # Spliced lists are not nodes of their own
+            rewritten = self.rewrite(node) if node.root != [] else None
+            if rewritten is None:
+                normal[id(node)] = node
+                done.append(node)
+            else:
+                rewrites += 1
+                if self.max_rewrites is not None and rewrites > self.max_rewrites:
+                    raise RuntimeError("too many rewrites (%d)" % rewrites)
+                stack.append((DOWN, rewritten))
+        return done[0]
+
+    def rewrite(self, node):
+        """The replacement of a node by the first transformer which changes it, or None"""
+        for transform in self.transforms:
+            for transformer, tree_tag in transform._transform(node):
+                if tree_tag is None:
+                    continue
+                if isinstance(tree_tag, TreeTransform.Scalar):
+                    root = transform._in_your_place(node.root, tree_tag.value)
+                    if root != node.root:
+                        return type(node)(root, node.subtrees)
+                else:
+                    new = transform._in_your_place(node.root, tree_tag)
+                    if new is not node and new != node:
+                        return new
+                break
+            else:
+                root = transform.scalar_transform(node.root)
+                if root is not None and root != node.root:
+                    return type(node)(root, node.subtrees)
+        return None
+
+    @staticmethod
+    def splice(subtrees):
+        if not any(s.root == [] for s in subtrees):
+            return subtrees
+        spliced = []
+        for s in subtrees:
+            if s.root == []:
+                spliced.extend(s.subtrees)
+            else:
+                spliced.append(s)
+        return spliced
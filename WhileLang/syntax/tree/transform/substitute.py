@@ -1,5 +1,8 @@
+import heapq
+
 from syntax.tree import Tree
 from syntax.tree.transform import TreeTransform
+from syntax.tree.search.index import PatternIndex
 
 
 class TreeSubstitutionBase(TreeTransform):
@@ -56,8 +59,47 @@ class TreeSubstitution(TreeSubstitutionBase):
 class TreePatternSubstitution(TreeSubstitutionBase):
     """
     @see .tree.search.TreePattern
+    The patterns are matched together through a `PatternIndex`, so each node is
+    matched against all of them in one descent. Transformers of other classes,
+    which may be called differently, are called on each node, in their turn.
     """
 
+    _index = None
+    # The ids of the transformers left out by `_except`, which share the index of the full list
+    _excluded = frozenset()
+
+    def _pattern_index(self):
+        # The index is rebuilt when the transformers are replaced
+        if self._index is None or self._index[0] is not self.transformers:
+            indexed, called = [], []
+            for order, t in enumerate(self.transformers):
+                if type(t).__call__ is TreePatternSubstitution.Transformer.__call__:
+                    indexed.append((t.replace_what, (order, t)))
+                else:
+                    called.append((order, t, None))
+            self._index = (self.transformers, PatternIndex(indexed), called)
+        return self._index
+
+    def _except(self, transformer):
+        # Called on every reapply, so the copy keeps this index and filters it instead of building its own
+        _, index, called = self._pattern_index()
+        tx = super()._except(transformer)
+        tx._index = (tx.transformers, index, called)
+        tx._excluded = self._excluded | {id(transformer)}
+        return tx
+
+    def _transform(self, tree):
+        _, index, called = self._pattern_index()
+        excluded = self._excluded
+        matched = ((order, t, mo) for (order, t), mo in index.match(tree))
+        for _, transformer, mo in heapq.merge(matched, called, key=lambda x: x[0]):
+            if id(transformer) in excluded:
+                continue
+            if mo is None:
+                yield transformer, transformer(tree)
+            else:
+                yield transformer, transformer.replace_with(mo)
+
     class Substitution:
         TreeSubstitution = TreeSubstitution
 
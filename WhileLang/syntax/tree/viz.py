@@ -2,6 +2,7 @@ from os import linesep
 from tempfile import NamedTemporaryFile
 
 from syntax.tree import Tree
+from syntax.tree.walk import PreorderWalk
 
 
 def dot_print(expr: Tree) -> None:
@@ -11,8 +12,8 @@ def dot_print(expr: Tree) -> None:
 edge [dir=forward]
 
 """
-    nodes = {id(n): (i, n) for (i, n) in enumerate(expr.nodes)}
-    edges = {(nodes[id(n)][0], nodes[id(s)][0]) for n in expr.nodes for s in n.subtrees}
+    nodes = {id(n): (i, n) for (i, n) in enumerate(PreorderWalk(expr))}
+    edges = {(nodes[id(n)][0], nodes[id(s)][0]) for (_, n) in nodes.values() for s in n.subtrees}
 
     def translate_backslash(x):
         return str(x).replace("\\", "\\\\")
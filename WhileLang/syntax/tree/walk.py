@@ -1,10 +1,16 @@
 """
 Traditional tree walks:
 - Pre-order walk
-- Post-order walk [not implemented yet]
-- In-order walk - for binary trees [not implemented yet]
+- Post-order walk
+- In-order walk - for binary trees
+- Level-order walk
+
+The walks are generators, which keep their own stack (or queue), so each takes
+linear time and any tree depth.
 """
 
+from collections import deque
+
 
 class TreeWalk:
     class Visitor:
@@ -31,9 +37,9 @@ class PreorderWalk(TreeWalk):
     def __iter__(self):
         stack = [self.tree]
         while stack:
-            top = stack[0]
+            top = stack.pop()
             yield top
-            stack[:1] = top.subtrees
+            stack.extend(reversed(top.subtrees))
 
 
 class PostorderWalk(TreeWalk):
@@ -46,7 +52,38 @@ class PostorderWalk(TreeWalk):
             if direction == UP:
                 yield top
             else:
-                stack += [(UP, top)] + [(DOWN, x) for x in top.subtrees]
+                stack.append((UP, top))
+                stack.extend((DOWN, x) for x in reversed(top.subtrees))
+
+
+class InorderWalk(TreeWalk):
+    """
+    Visits the left subtree, then the node, then the right subtree.
+    A node with other than two subtrees is visited after its first subtree and before the rest.
+    """
+
+    def __iter__(self):
+        DOWN, UP = 0, 1
+        stack = [(DOWN, self.tree)]
+        while stack:
+            direction, top = stack.pop()
+            if direction == UP:
+                yield top
+            else:
+                stack.extend((DOWN, x) for x in reversed(top.subtrees[1:]))
+                stack.append((UP, top))
+                if top.subtrees:
+                    stack.append((DOWN, top.subtrees[0]))
+
+
+class LevelorderWalk(TreeWalk):
+
+    def __iter__(self):
+        queue = deque([self.tree])
+        while queue:
+            top = queue.popleft()
+            yield top
+            queue.extend(top.subtrees)
 
 
 class RichTreeWalk:
@@ -80,19 +117,32 @@ class RichTreeWalk:
         return self.visitor.done(tree, final)
 
     def _traverse(self, tree):
+        # Each entered subtree has a frame of (node, prefix, infix, subtrees left to descend to)
+        stack = []
+        final = self._enter(tree, stack)
+        while stack:
+            node, prefix, infix, subtrees = stack[-1]
+            sub = next(subtrees, None)
+            if sub is not None:
+                skipped = self._enter(sub, stack)
+                if skipped is not None:
+                    infix.append(skipped)
+            else:
+                stack.pop()
+                postfix = self.visitor.leave(node)
+                final = self.visitor.join(node, prefix, infix, postfix)
+                if stack:
+                    stack[-1][2].append(final)
+        return final
+
+    def _enter(self, tree, stack):
+        """Enters a subtree and pushes its frame, or returns SKIP if the visitor skips it"""
         descend = [1]
         prefix = self.visitor.enter(tree, descend.pop)
         if prefix is self.Visitor.SKIP:
             return prefix
-        elif descend:
-            infix = self._descend(tree)
-        else:
-            infix = []
-        postfix = self.visitor.leave(tree)
-        return self.visitor.join(tree, prefix, infix, postfix)
-
-    def _descend(self, tree):
-        return [self._traverse(sub) for sub in tree.subtrees]
+        stack.append((tree, prefix, [], iter(tree.subtrees if descend else ())))
+        return None
 
 
 class CollectVisitor(RichTreeWalk.Visitor):
@@ -117,3 +167,6 @@ if __name__ == "__main__":
         tree = TreeAssistant.build(input)
         print(tree)
         print([x.root for x in PreorderWalk(tree)])
+        print([x.root for x in PostorderWalk(tree)])
+        print([x.root for x in InorderWalk(tree)])
+        print([x.root for x in LevelorderWalk(tree)])
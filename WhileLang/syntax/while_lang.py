@@ -1,10 +1,16 @@
+import os
+import re
 import typing
+import logging
+import functools
 
-from syntax.tree import Tree
+from syntax.tree import Tree, InternedTree, share
 from syntax.parsing.earley.earley import Grammar, Parser, ParseTrees
 from syntax.parsing.silly import SillyLexer
 
-__all__ = ["parse"]
+logger = logging.getLogger(__name__)
+
+__all__ = ["parse", "reparse"]
 
 
 class WhileParser:
@@ -28,7 +34,7 @@ class WhileParser:
 
     def __init__(self) -> None:
         self.tokenizer = SillyLexer(self.TOKENS)
-        self.grammar = Grammar.from_string(self.GRAMMAR)
+        self.grammar = Grammar.from_string(self.GRAMMAR).compile()
 
     def __call__(self, program_text: str) -> typing.Optional[Tree]:
         tokens = list(self.tokenizer(program_text))
@@ -38,13 +44,23 @@ class WhileParser:
 
         if earley.is_valid_sentence():
             trees = ParseTrees(earley)
-            assert len(trees) == 1
-            return self.postprocess(trees.nodes[0])
+            assert not trees.is_ambiguous()
+            return self.postprocess(trees.first())
         else:
             return None
 
     def postprocess(self, t: Tree) -> Tree:
-        if t.root in ["γ", "S", "S1", "E", "E0"] and len(t.subtrees) == 1:
+        if t.root == "S" and len(t.subtrees) == 3:
+            # S1 ; S1 ; ... ; S1 is nested to the right, so it is walked in a loop
+            statements = []
+            while t.root == "S" and len(t.subtrees) == 3:
+                statements.append(self.postprocess(t.subtrees[0]))
+                t = t.subtrees[2]
+            tree = self.postprocess(t)
+            for statement in reversed(statements):
+                tree = Tree(";", [statement, tree])
+            return tree
+        elif t.root in ["γ", "S", "S1", "E", "E0"] and len(t.subtrees) == 1:
             return self.postprocess(t.subtrees[0])
         elif (
             t.root in ["S", "S1", "E"]
@@ -67,10 +83,293 @@ class WhileParser:
         return Tree(t.root, [self.postprocess(s) for s in t.subtrees])
 
 
-def parse(program_text: str) -> typing.Optional[Tree]:
-    return WhileParser()(program_text)
+class WhileDescentParser:
+    """
+    A recursive-descent parser for `WhileParser.GRAMMAR`, which is LL(1).
+    It reads the tokens of the same lexer and builds the same trees as `WhileParser.postprocess`,
+    and `WhileParser` is kept as the reference implementation.
+    """
+
+    class Error(Exception):
+        pass
+
+    def __init__(self) -> None:
+        self.tokenizer = SillyLexer(WhileParser.TOKENS)
+
+    def __call__(self, program_text: str) -> typing.Optional[Tree]:
+        tokens = [(word.tags[0], word.word) for word in self.tokenizer(program_text)]
+        try:
+            return _WhileDescent(tokens).program()
+        except self.Error:
+            return None
+
+
+class _WhileDescent:
+    """The state of a single run of `WhileDescentParser`: the tokens and the current position."""
+
+    def __init__(self, tokens: typing.List[typing.Tuple[str, str]]) -> None:
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self) -> typing.Optional[str]:
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def expect(self, tag: str) -> str:
+        if self.peek() != tag:
+            raise WhileDescentParser.Error(f"expected '{tag}' at token {self.pos}")
+        word = self.tokens[self.pos][1]
+        self.pos += 1
+        return word
+
+    def program(self) -> Tree:
+        tree = self.statements()
+        if self.pos != len(self.tokens):
+            raise WhileDescentParser.Error(f"unexpected token at {self.pos}")
+        return tree
+
+    def statements(self) -> Tree:
+        """S -> S1 | S1 ; S"""
+        statements = [self.statement()]
+        while self.peek() == ";":
+            self.pos += 1
+            statements.append(self.statement())
+
+        tree = statements[-1]
+        for statement in reversed(statements[:-1]):
+            tree = Tree(";", [statement, tree])
+        return tree
+
+    def statement(self) -> Tree:
+        """S1 -> skip | id := E | if E then S else S1 | if_unrolled E then S else S1 | while E do S1
+                | assert E | assert_unrolled E | ( S )"""
+        tag = self.peek()
+        if tag == "skip":
+            return Tree("skip", [Tree(self.expect("skip"))])
+        elif tag == "id":
+            var = Tree("id", [Tree(self.expect("id"))])
+            self.expect(":=")
+            return Tree(":=", [var, self.expression()])
+        elif tag in ["if", "if_unrolled"]:
+            self.pos += 1
+            cond = self.expression()
+            self.expect("then")
+            then_branch = self.statements()
+            self.expect("else")
+            return Tree(tag, [cond, then_branch, self.statement()])
+        elif tag == "while":
+            self.pos += 1
+            cond = self.expression()
+            self.expect("do")
+            return Tree(tag, [cond, self.statement()])
+        elif tag in ["assert", "assert_unrolled"]:
+            self.pos += 1
+            return Tree(tag, [self.expression()])
+        elif tag == "(":
+            self.pos += 1
+            tree = self.statements()
+            self.expect(")")
+            return tree
+        raise WhileDescentParser.Error(f"unexpected token at {self.pos}")
+
+    def expression(self) -> Tree:
+        """E -> E0 | E0 op E0"""
+        left = self.atom()
+        if self.peek() == "op":
+            op = self.expect("op")
+            return Tree(op, [left, self.atom()])
+        return left
+
+    def atom(self) -> Tree:
+        """E0 -> id | num | hole | ( E )"""
+        tag = self.peek()
+        if tag == "id":
+            return Tree("id", [Tree(self.expect("id"))])
+        elif tag == "num":
+            return Tree("num", [Tree(int(self.expect("num")))])
+        elif tag == "hole":
+            return Tree("hole", [Tree(self.expect("hole"))])
+        elif tag == "(":
+            self.pos += 1
+            tree = self.expression()
+            self.expect(")")
+            return tree
+        raise WhileDescentParser.Error(f"unexpected token at {self.pos}")
+
+
+# The parsers `parse` can use. "descent" is the fast one, "earley" is the reference
+BACKENDS = {"descent": WhileDescentParser, "earley": WhileParser}
+DEFAULT_BACKEND = "descent"
+
+
+@functools.lru_cache(maxsize=None)
+def get_parser(backend: str = DEFAULT_BACKEND):
+    """The parser of the module for the given backend, built once"""
+    return BACKENDS[backend]()
+
+
+@functools.lru_cache(maxsize=256)
+def parse(program_text: str, backend: str = DEFAULT_BACKEND) -> typing.Optional[Tree]:
+    """Parses a While program. The trees of recently parsed programs are cached and
+    shared between the callers, so they must not be changed in place: they are marked
+    as shared (see `syntax.tree.share`), and the in-place transformations refuse them.
+    Transform them into new trees, or change a `clone()` of them."""
+    tree = get_parser(backend)(program_text)
+    return share(tree) if tree is not None else None
+
+
+# The tokens which nest statements, and the statements separator
+_NESTING_TOKENS = re.compile(r"[();]|\b(?:then|else)\b")
+
+# The statement spans of the last program `reparse` made a tree for, which is usually the next one it is given
+_last_spans: typing.Tuple[typing.Optional[str], typing.Optional[typing.List[typing.Tuple[int, int]]]] = (None, None)
+
+
+def _statement_spans(program_text: str) -> typing.Optional[typing.List[typing.Tuple[int, int]]]:
+    """
+    The spans of the top level statements of a program: the text between the `;` which aren't
+    inside parentheses or a `then` branch. The spans cover all the text but these `;`.
+    Returns None if the parentheses or the branches aren't balanced.
+    """
+    if _last_spans[0] == program_text:
+        return _last_spans[1]
+
+    spans = []
+    start = 0
+    depth = 0
+    for mo in _NESTING_TOKENS.finditer(program_text):
+        word = mo.group()
+        if word in ["(", "then"]:
+            depth += 1
+        elif word in [")", "else"]:
+            depth -= 1
+            if depth < 0:
+                return None
+        elif word == ";" and depth == 0:
+            spans.append((start, mo.start()))
+            start = mo.end()
+    if depth != 0:
+        return None
+    spans.append((start, len(program_text)))
+    return spans
+
+
+def _split_statements(tree: Tree, count: int) -> typing.Optional[typing.List[Tree]]:
+    """Splits the tree of a sequence of `count` top level statements, or returns None if it has less"""
+    statements = []
+    for _ in range(count - 1):
+        if tree.root != ";":
+            return None
+        statements.append(tree.subtrees[0])
+        tree = tree.subtrees[1]
+    statements.append(tree)
+    return statements
+
+
+def _join_statements(statements: typing.List[Tree]) -> Tree:
+    tree = statements[-1]
+    for statement in reversed(statements[:-1]):
+        tree = Tree(";", [statement, tree])
+    return tree
+
+
+def reparse(tree: typing.Optional[Tree], old_text: str, edit: typing.Tuple[int, int, str]) -> typing.Optional[Tree]:
+    """
+    Parses a program after an edit, given the tree of the program before it.
+    Only the top level statements the edit touches are parsed again, and the trees of the others are reused.
+    Falls back to parsing the whole program when the edit can't be confined to whole statements.
+
+    Args:
+        tree (Tree): The tree of `old_text`, or None if it had no tree.
+        old_text (str): The program before the edit.
+        edit (tuple): (start, end, replacement) - the text between the offsets `start` and `end` of `old_text` is replaced.
+
+    Returns:
+        Tree: The tree of the edited program (as `parse` would return it), or None if it can't be parsed.
+    """
+    start, end, replacement = edit
+    new_text = old_text[:start] + replacement + old_text[end:]
+    if tree is None:
+        return parse(new_text)
+
+    spans = _statement_spans(old_text)
+    statements = _split_statements(tree, len(spans)) if spans is not None else None
+    if statements is None:
+        return parse(new_text)
+
+    touched = [i for i, (span_start, span_end) in enumerate(spans) if span_start <= end and span_end >= start]
+    first, last = touched[0], touched[-1]
+    shift = len(replacement) - (end - start)
+    region_start = spans[first][0]
+    region_text = new_text[region_start:spans[last][1] + shift]
+
+    region_tree = parse(region_text)
+    region_spans = _statement_spans(region_text)
+    if region_tree is None or region_spans is None:
+        return parse(new_text)
+    region = _split_statements(region_tree, len(region_spans))
+    if region is None:
+        return parse(new_text)
+
+    global _last_spans
+    _last_spans = (new_text, spans[:first]
+                   + [(region_start + span_start, region_start + span_end) for span_start, span_end in region_spans]
+                   + [(span_start + shift, span_end + shift) for span_start, span_end in spans[last + 1:]])
+
+    logger.debug("reparsed statements %d to %d", first, last)
+    return _join_statements(statements[:first] + region + statements[last + 1:])
+
+
+def reparse_text(tree: typing.Optional[Tree], old_text: typing.Optional[str], new_text: str) -> typing.Optional[Tree]:
+    """Like `reparse`, where the edit is the text between the common prefix and suffix of the two texts"""
+    if old_text is None:
+        return parse(new_text)
+    if old_text == new_text:
+        return tree
+
+    prefix = len(os.path.commonprefix([old_text, new_text]))
+    suffix = len(os.path.commonprefix([old_text[prefix:][::-1], new_text[prefix:][::-1]]))
+
+    return reparse(tree, old_text, (prefix, len(old_text) - suffix, new_text[prefix:len(new_text) - suffix]))
+
+def flatten_sequence(tree: Tree) -> typing.List[Tree]:
+    """The statements of a program in order, where sequences (`;`, nested either way) are flattened."""
+    statements = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node.root == ";":
+            stack.extend(reversed(node.subtrees))
+        else:
+            statements.append(node)
+    return statements
+
+
+def _rebuild(tree: Tree, leave: typing.Callable[[Tree, typing.List[Tree]], typing.Optional[Tree]],
+             descend: typing.Callable[[Tree], bool] = lambda t: True) -> typing.Optional[Tree]:
+    """
+    Rebuilds a tree bottom-up with an explicit stack: `leave(node, subtrees)` gives the new node of each node
+    from its new subtrees (where the subtrees it gave None for are dropped).
+    The nodes which `descend` is false for are given to `leave` with their subtrees as they are.
+    """
+    done = []
+    stack = [(tree, False)]
+    while stack:
+        node, ready = stack.pop()
+        if not ready and descend(node):
+            stack.append((node, True))
+            stack.extend((s, False) for s in reversed(node.subtrees))
+            continue
+        if ready:
+            first = len(done) - len(node.subtrees)
+            subtrees = [s for s in done[first:] if s is not None]
+            del done[first:]
+        else:
+            subtrees = node.subtrees
+        done.append(leave(node, subtrees))
+    return done[0]
+
 
-def unroll_while(tree: Tree, unroll_bound: int) -> Tree:
+def unroll_while(tree: Tree, unroll_bound: int, interned: bool = False) -> Tree:
     """
     Unrolls a `while` loop in the AST by replacing it with repeated `if cond then body else skip`
     statements without nesting, but as a sequence of separate condition checks.
@@ -78,31 +377,60 @@ def unroll_while(tree: Tree, unroll_bound: int) -> Tree:
     Args:
         tree (Tree): The abstract syntax tree containing a `while` loop.
         unroll_bound (int): The number of times to unroll the loop.
+        interned (bool): Build the new tree of `InternedTree` nodes, so the unrolled
+            iterations are a single shared node each.
     
     Returns:
         Tree: The new unrolled tree.
     """
-    if tree.root == "while":
-        
-        cond = tree.subtrees[0]
-        body = tree.subtrees[1]
+    tree_type = InternedTree if interned else Tree
+
+    def leave(node: Tree, subtrees: typing.List[Tree]) -> Tree:
+        if node.root != "while":
+            return tree_type(node.root, subtrees)
+
+        cond = node.subtrees[0]
+        body = node.subtrees[1]
         
         # Start with the first `if cond then body else skip`
-        unrolled = Tree("if_unrolled", [cond, body, Tree("skip", [])])  # First unrolled iteration
+        unrolled = tree_type("if_unrolled", [cond, body, tree_type("skip", [])])  # First unrolled iteration
         
         # Create a sequence of `if cond then body else skip` statements
         for _ in range(unroll_bound - 1):
-            next_unroll = Tree("if_unrolled", [cond, body, Tree("skip", [])])
-            unrolled = Tree(";", [unrolled, next_unroll])  # Sequence them with `;`
+            next_unroll = tree_type("if_unrolled", [cond, body, tree_type("skip", [])])
+            unrolled = tree_type(";", [unrolled, next_unroll])  # Sequence them with `;`
         
         # Add an assertion to ensure the loop terminates (the condition will be evaluated as False in WP)
-        assert_unrolled = Tree("assert_unrolled", [cond])
-        unrolled = Tree(";", [unrolled, assert_unrolled])
+        assert_unrolled = tree_type("assert_unrolled", [cond])
+        unrolled = tree_type(";", [unrolled, assert_unrolled])
 
         return unrolled
     
-    # Recursively unroll any other while loops inside the tree
-    return Tree(tree.root, [unroll_while(subtree, unroll_bound) for subtree in tree.subtrees])
+    # Unroll the while loops inside the tree (but not the loops inside them)
+    return _rebuild(tree, leave, descend=lambda t: t.root != "while")
+
+
+def name_holes(tree: Tree, prefix: str = "hole_") -> typing.Tuple[Tree, typing.List[str]]:
+    """
+    Gives each hole (`??`) in the AST a stable id. The holes are numbered by their order in the program text.
+
+    Args:
+        tree (Tree): The abstract syntax tree of the program.
+        prefix (str): The prefix of the holes ids.
+
+    Returns:
+        Tuple[Tree, List[str]]: A new tree where each hole node holds its id, and the list of the ids.
+    """
+    holes = []
+
+    def name(t: Tree, subtrees: typing.List[Tree]) -> Tree:
+        if t.root == "hole":
+            holes.append(f"{prefix}{len(holes)}")
+            return Tree("hole", [Tree(holes[-1])])
+        return Tree(t.root, subtrees)
+
+    # The nodes are rebuilt left to right, so the holes are named in the order of the text
+    return _rebuild(tree, name), holes
 
 
 def parse_and_unroll(program: str, unroll_limit: int = 8) -> Tree:
@@ -119,7 +447,7 @@ def parse_and_unroll(program: str, unroll_limit: int = 8) -> Tree:
     ast = parse(program)
     if ast:
         res = unroll_while(ast, unroll_limit)
-        print(res)
+        logger.debug("%s", res)
         return res
     else:
         return None
@@ -177,9 +505,7 @@ def tree_to_program(tree: Tree) -> str:
         return "??"
     
     elif tree.root == ";":  # Sequence of statements (S; S)
-        left = tree_to_program(tree.subtrees[0])
-        right = tree_to_program(tree.subtrees[1])
-        return f"{left} ; {right}"
+        return " ; ".join(tree_to_program(statement) for statement in flatten_sequence(tree))
     
     else:
         # For any other unhandled case (e.g., grouping expressions)
@@ -199,33 +525,28 @@ def ast_to_string(ast: Tree) -> str:
     return tree_to_program(ast)
 
 def remove_assertions_ast(ast):
+    """Returns a copy of the AST without its assertions, or None if nothing is left. The given AST isn't changed."""
     if(ast is None):
         return None
 
-    if ast.root == "assert":
-        return None
-    else:
-        new_subtrees = []
-        for subtree in ast.subtrees:
-            new_subtree = remove_assertions_ast(subtree)
-            if new_subtree is not None:
-                new_subtrees.append(new_subtree)
-        ast.subtrees = new_subtrees
-
-        if ast.root == ';' and len(ast.subtrees) == 1:
-            ast = ast.subtrees[0]
-        elif ast.root == ';' and len(ast.subtrees) == 0:
-            ast = None
+    def leave(node: Tree, subtrees: typing.List[Tree]) -> typing.Optional[Tree]:
+        if node.root == "assert":
+            return None
+        if node.root == ';' and len(subtrees) == 1:
+            return subtrees[0]
+        elif node.root == ';' and len(subtrees) == 0:
+            return None
+        return Tree(node.root, subtrees)
 
-    return ast
+    return _rebuild(ast, leave, descend=lambda t: t.root != "assert")
 
 def remove_assertions_program(program):
     ast = parse(program)
     if ast is None:
         return None
-    print(f"ast_old: {ast}")
+    logger.debug("ast_old: %s", ast)
     ast_new = remove_assertions_ast(ast)
-    print(f"ast_new: {ast_new}")
+    logger.debug("ast_new: %s", ast_new)
 
     if(ast_new is None):
         return None
@@ -0,0 +1,247 @@
+from syntax.while_lang import parse, tree_to_program
+from syntax.tree import Tree, InternedTree
+from syntax.tree.flat import FlatTree
+from syntax.tree.build import TreeAssistant
+from syntax.tree.walk import PreorderWalk, PostorderWalk, InorderWalk, LevelorderWalk
+from syntax.tree.search import ScanFor
+from syntax.tree.search.index import PatternIndex
+from syntax.tree.search.pattern import TreeTopPattern, TreeRootPattern, ConditionalPattern
+from syntax.tree.transform.substitute import TreePatternSubstitution, TreeSubstitution
+from syntax.tree.transform.pipeline import RewritePipeline
+from parser_tests import corpus_programs, error_cases, RED, GREEN, RESET
+import pickle
+
+def interned_tree_case(program):
+    """Interning a tree keeps its structure, and interning an equal tree gives the same object"""
+    tree = parse(program)
+    interned = InternedTree.intern(tree)
+    again = InternedTree.intern(Tree.reconstruct(tree))
+    if interned is not again or repr(interned) != repr(tree) or pickle.loads(pickle.dumps(interned)) is not interned:
+        print(f"{RED}Interning failed!{RESET}")
+        print(f"program: {program}")
+        return False
+    return True
+
+
+def flat_tree_case(program):
+    """Flattening a tree keeps its structure, both through the node views and back as a tree"""
+    tree = parse(program)
+    flat = FlatTree.from_tree(tree)
+    walked = [node.root for node in PreorderWalk(flat.tree)]
+    if (flat.to_tree() != tree or repr(flat.tree) != repr(tree) or walked != [node.root for node in PreorderWalk(tree)]
+            or flat.tree != FlatTree.from_tree(tree).tree or len(flat.tree.subtrees) != len(tree.subtrees)):
+        print(f"{RED}Flattening failed!{RESET}")
+        print(f"program: {program}")
+        return False
+    return True
+
+
+def walks_case():
+    """The walks visit the nodes in their order, also on trees deeper than the recursion limit"""
+    tree = TreeAssistant.build((1, [(2, [3, 4, 5]), (6, [(7, [8]), 9])]))
+    orders = {
+        PreorderWalk: [1, 2, 3, 4, 5, 6, 7, 8, 9],
+        PostorderWalk: [3, 4, 5, 2, 8, 7, 9, 6, 1],
+        InorderWalk: [3, 2, 4, 5, 1, 8, 7, 6, 9],
+        LevelorderWalk: [1, 2, 6, 3, 4, 5, 7, 9, 8],
+    }
+    deep = Tree(0)
+    for i in range(10000):
+        deep = Tree(";", [Tree(i), deep])
+
+    for walk, expected in orders.items():
+        output = [node.root for node in walk(tree)]
+        if output != expected or len(list(walk(deep))) != 20001:
+            print(f"{RED}{walk.__name__} failed!{RESET}")
+            print(f"output: {output}")
+            print(f"expected: {expected}")
+            return False
+    return deep.depth == 10000
+
+
+def scan_case():
+    """ScanFor finds the paths of the holes of a long program"""
+    program = " ; ".join(f"x{i} := x{i} + ??" if i % 100 == 0 else f"x{i} := {i}" for i in range(3000))
+    tree = parse(program)
+    paths = ScanFor(lambda root: root == "hole", applies_to = ScanFor.VALUE)(tree)
+    first = next(ScanFor(lambda root: root == "hole", applies_to = ScanFor.VALUE).scan(tree))
+    if len(paths) != 30 or paths[0] != first or paths[-1].start is not tree or len(paths[-1]) != 2904:
+        print(f"{RED}ScanFor failed!{RESET}")
+        return False
+
+    # A path criterion reads the path like a `Path`: the holes right under the second statement
+    second = paths[1].up().up()
+    criterion = lambda path: path.startswith(second) and len(path) == len(second) + 2 and path[-1]().root == "hole"
+    path_matches = ScanFor(criterion, applies_to = ScanFor.PATH)(tree)
+    if path_matches != [paths[1]]:
+        print(f"{RED}ScanFor with a path criterion failed!{RESET}")
+        return False
+    return True
+
+
+def index_patterns():
+    """Many simplification-like patterns, of all the kinds the index handles"""
+    build = TreeAssistant.build
+    patterns = []
+    for op in ["+", "-", "*", "/", "<", ">", "=", "<=", ">=", "!="]:
+        for k in range(5):
+            patterns.append(TreeTopPattern(build((op, ["$a", ("num", [k])]))))
+            patterns.append(TreeTopPattern(build((op, [("num", [k]), "$b"]))))
+        patterns.append(TreeTopPattern(build((op, ["$a", "$a"]))))
+    patterns.append(TreeTopPattern(build(("?op", [("id", ["x"]), "$b"]))))
+    patterns.append(TreeTopPattern(build((":=", ["$v", ("?op", ["$a", "$b"])]))))
+    patterns.append(TreeTopPattern(build((";", ["$..."]))))
+    patterns.append(TreeRootPattern("if", 3))
+    patterns.append(TreeRootPattern("while"))
+    patterns.append(ConditionalPattern(TreeTopPattern(build(("+", ["$a", "$b"]))), lambda groups: groups["$a"] == groups["$b"]))
+    patterns.append(AnyNumberPattern(build(("*", ["$a", ("num", ["#"])]))))
+    return patterns
+
+
+class AnyNumberPattern(TreeTopPattern):
+    """A pattern where `#` matches any number, so it can't be keyed by its template"""
+    def scalar_match(self, pattern, text):
+        if pattern == "#" and isinstance(text, int):
+            return self.MatchObject(text, {})
+        return super().scalar_match(pattern, text)
+
+
+class EvenNumbersSubstitution(TreePatternSubstitution):
+    """Substitutes only the matches of even numbers, which its transformers check when they are called"""
+    class Transformer(TreePatternSubstitution.Transformer):
+        def __call__(self, tree):
+            mo = self.replace_what.match(tree)
+            if mo is not None and mo.groups["?k"] % 2 == 0:
+                return self.replace_with(mo)
+
+
+def custom_substitution_case():
+    """Transformers which override how they are called are called, and not only matched through the index"""
+    build = TreeAssistant.build
+    substitution = EvenNumbersSubstitution({TreeTopPattern(build(("num", ["?k"]))): build(("num", [0]))})
+    output = tree_to_program(substitution(parse("x := 3 ; y := 4 ; z := (x * 6)")))
+    if output != "x := 3 ; y := 0 ; z := (x * 0)":
+        print(f"{RED}Custom substitution failed! {output}{RESET}")
+        return False
+    return True
+
+
+class DescendingSubstitution(TreePatternSubstitution):
+    """Applies the other transformers again to a replacement (see `TreeTransform._reapply`)"""
+    IS_DESCENDING = True
+
+
+def descending_substitution_case():
+    """Reapplying the other transformers to a replacement reuses the pattern index, without the last transformer"""
+    build = TreeAssistant.build
+    simplify = DescendingSubstitution({
+        TreeTopPattern(build(("+", ["$a", ("num", [0])]))): build("$a"),
+        TreeTopPattern(build(("*", ["$a", ("num", [1])]))): build("$a"),
+    })
+    output = tree_to_program(simplify(parse("x := ((y * 1) + 0)")))
+    rest = simplify._except(simplify.transformers[0])
+    matched = [t for t, tree_tag in rest._transform(parse("x := (y + 0)").subtrees[1]) if tree_tag is not None]
+    if output != "x := y" or rest._pattern_index()[1] is not simplify._pattern_index()[1] or matched != []:
+        print(f"{RED}Descending substitution failed! {output} {matched}{RESET}")
+        return False
+    return True
+
+
+def index_case(index, patterns, program):
+    """The index finds the same matches as matching each pattern in turn"""
+    for node in PreorderWalk(parse(program)):
+        expected = [(p, mo.groups) for p in patterns for mo in [p.match(node)] if mo is not None]
+        output = [(p, mo.groups) for p, mo in index.match(node)]
+        if output != expected:
+            print(f"{RED}Pattern index failed!{RESET}")
+            print(f"program: {program}")
+            print(f"node: {node}")
+            print(f"output: {output}")
+            print(f"expected: {expected}")
+            return False
+    return True
+
+
+def rewrite_transforms():
+    """Simplifications, then a renaming, which together need several passes"""
+    build = TreeAssistant.build
+    simplify = TreePatternSubstitution({
+        TreeTopPattern(build(("+", ["$a", ("num", [0])]))): build("$a"),
+        TreeTopPattern(build(("+", [("num", [0]), "$a"]))): build("$a"),
+        TreeTopPattern(build(("*", ["$a", ("num", [1])]))): build("$a"),
+        TreeTopPattern(build(("-", ["$a", "$a"]))): build(("num", [0])),
+        TreeTopPattern(build((";", [("skip", ["skip"]), "$a"]))): build("$a"),
+    })
+    rename = TreeSubstitution({"y": "x"})
+    return [simplify, rename]
+
+
+def pipeline_case(pipeline, transforms, program):
+    """The pipeline reaches the same fixpoint as applying the transforms pass after pass"""
+    tree = parse(program)
+    expected = tree
+    while True:
+        next_tree = expected
+        for transform in transforms:
+            next_tree = transform(next_tree)
+        if next_tree == expected:
+            break
+        expected = next_tree
+
+    output = pipeline(tree)
+    if output != expected or (expected == tree and output is not tree):
+        print(f"{RED}Rewrite pipeline failed!{RESET}")
+        print(f"program: {program}")
+        print(f"output: {output}")
+        print(f"expected: {expected}")
+        return False
+    return True
+
+
+def shared_parse_case():
+    """Cached parse results are shared, so the in-place transformations should refuse them"""
+    program = "y := (x + 0) ; z := y"
+    tree = parse(program)
+    simplify, rename = rewrite_transforms()
+    try:
+        rename.inplace(tree)
+        print(f"{RED}A cached parse result was changed in place!{RESET}")
+        return False
+    except ValueError:
+        pass
+    expected = repr(tree)
+    renamed = simplify.inplace(rename.inplace(tree.clone()))
+    new = simplify(rename(tree))
+    if repr(parse(program)) != expected or renamed != new or repr(new) == expected:
+        print(f"{RED}Shared parse results failed!{RESET}")
+        return False
+    return True
+
+def tree_tests():
+    programs = [program for program in corpus_programs() + error_cases() if parse(program) is not None]
+    results = [program for program in programs if not interned_tree_case(program)]
+    results += [program for program in programs if not flat_tree_case(program)]
+    if not walks_case():
+        results.append("walks_case")
+    patterns = index_patterns()
+    index = PatternIndex(patterns)
+    results += [program for program in programs if not index_case(index, patterns, program)]
+    transforms = rewrite_transforms()
+    pipeline = RewritePipeline(transforms)
+    rewrite_programs = programs + ["skip ; y := (y - y) + 0 ; z := x * 1", "x := ((y - x) + 0) * 1"]
+    results += [program for program in rewrite_programs if not pipeline_case(pipeline, transforms, program)]
+    if not scan_case():
+        results.append("scan_case")
+    if not shared_parse_case():
+        results.append("shared_parse_case")
+    if not custom_substitution_case():
+        results.append("custom_substitution_case")
+    if not descending_substitution_case():
+        results.append("descending_substitution_case")
+
+    print(f"\n********************************\n")
+
+    if results == []:
+        print(f"{GREEN}All tests passed! ({len(programs)} programs){RESET}")
+    else:
+        print(f"{RED}Tests failed: {RESET} {results}")
@@ -1,9 +1,17 @@
+import os
+import time
 import typing
+import logging
 import operator
-from z3 import Int, ForAll, Implies, Not, And, Solver, unsat, sat, Ast, Or, Exists
+import threading
+import multiprocessing
+import multiprocessing.connection
+from z3 import Int, FreshInt, BoolRef, ForAll, Implies, Not, And, If, Solver, unsat, sat, Ast, ExprRef, Or, Exists, Bool, is_int_value
 
 from syntax.tree import Tree
-from syntax.while_lang import parse
+from syntax.while_lang import parse, flatten_sequence, tree_to_program
+
+logger = logging.getLogger(__name__)
 
 
 Formula: typing.TypeAlias = Ast | bool
@@ -31,10 +39,12 @@ def getPvars(ast: Tree):
     returns the set.
     """
     pvars = set()
-    if ast.root == "id":
-        pvars.add(ast.subtrees[0].root)
-    for child in ast.subtrees:
-        pvars.update(getPvars(child))
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if node.root == "id":
+            pvars.add(node.subtrees[0].root)
+        stack.extend(node.subtrees)
     return pvars
 
 def mk_env(pvars: set[PVar]) -> Env:
@@ -55,7 +65,12 @@ def upd(d: Env, k: PVar, v: Formula) -> Env:
 
 class WP:
 
-    def __init__(self, ast):
+    def __init__(self, ast, unroll_bound: BoolRef = None, skolemize: bool = False):
+        """If `unroll_bound` is given, the `assert_unrolled` checks are only made when it is true.
+        When it is false, executions which don't leave an unrolled loop within the unrolling bound are
+        assumed away instead of failing.
+        If `skolemize` is true, the loop rules are stated over fresh constants instead of being quantified
+        over all the states, so the VC is quantifier free. It can then only be checked for validity."""
 
         #print(ast)
         env, vars = mk_env_from_ast(ast)
@@ -65,6 +80,27 @@ class WP:
         self.env = env
         self.vars = vars
 
+        # Defining equations of the intermediate states which are named by the computed formulas
+        self.definitions = []
+        self._has_loop = {}
+        self.unroll_bound = unroll_bound
+        self.skolemize = skolemize
+
+    def vc(self, ast: Tree, P: Invariant, Q: Invariant, linv: Invariant, env: Env = None):
+        """Computes the verification condition of {P} ast {Q} in the environment `env`.
+        Returns (pre, post, definitions), where `definitions` are the defining equations of the
+        intermediate states that `post` refers to.
+        The triple is valid iff Implies(And(pre, *definitions), post) is valid, and (unless the loop rules
+        are skolemized) there is an input which satisfies it iff And(pre, post, *definitions) is satisfiable."""
+        if env is None:
+            env = self.env
+
+        outer, self.definitions = self.definitions, []
+        post = self.wp(ast, Q, linv)(env)
+        definitions, self.definitions = self.definitions, outer
+
+        return P(env), post, definitions
+
     def eval_expr(self, expr: Tree, env) -> Formula:
         """Evaluate the expression `expr` in the environment `env`."""
         node_type = expr.root
@@ -74,6 +110,9 @@ class WP:
             return env[childrens[0].root]
         elif node_type == "num":
             return childrens[0].root
+        elif node_type == "hole":
+            # A named hole (see `name_holes`) is an unknown constant of the program
+            return Int(childrens[0].root)
         elif node_type in OP:
             left = self.eval_expr(childrens[0], env)
             right = self.eval_expr(childrens[1], env)
@@ -81,63 +120,197 @@ class WP:
         else:
             raise ValueError(f"Unknown expression type: {node_type}")
 
+    def has_loop(self, ast: Tree) -> bool:
+        """Checks whether the statement `ast` contains a `while` loop (memoized per node).
+        With an unrolling bound, an `assert_unrolled` counts as a loop too, since it also puts the rest of
+        the program under a formula of its own, which a branch computed on its own would close over True."""
+        memo = self._has_loop
+        loops = ("while",) if self.unroll_bound is None else ("while", "assert_unrolled")
+        stack = [(ast, False)]
+        while stack:
+            node, ready = stack.pop()
+            if id(node) in memo:
+                continue
+            if ready:
+                memo[id(node)] = node.root in loops or any(memo[id(s)] for s in node.subtrees)
+            else:
+                stack.append((node, True))
+                stack.extend((s, False) for s in node.subtrees if id(s) not in memo)
+        return memo[id(ast)]
+
+    def merge(self, cond: Formula, then_env: Env, else_env: Env) -> Env:
+        """Names the state after a conditional: each variable which the branches set differently gets a
+        fresh constant, defined as the value of the branch that `cond` selects."""
+        env = then_env.copy()
+        for var, then_value in then_env.items():
+            else_value = else_env[var]
+            if isinstance(then_value, ExprRef) and isinstance(else_value, ExprRef):
+                same = then_value.eq(else_value)
+            else:
+                same = type(then_value) == type(else_value) and then_value == else_value
+            if not same:
+                env[var] = FreshInt(var)
+                self.definitions.append(env[var] == If(cond, then_value, else_value))
+        return env
 
     def wp(self, ast: Tree, Q: Invariant, linv: Invariant) -> Invariant:
         """Compute the weakest precondition of statement `ast` with respect to postcondition `Q`."""
-        node_type = ast.root
-        subtrees = ast.subtrees
-
-        if node_type == "skip":
-            return Q
-        elif node_type == ":=":
-            x = subtrees[0].subtrees[0].root
-            e = subtrees[1]
-            return lambda env: Q(upd(env, x, self.eval_expr(e, env)))
-        elif node_type == ";":
-            S1 = subtrees[0]
-            S2 = subtrees[1]
-            return self.wp(S1, self.wp(S2, Q, linv), linv)
-        elif node_type == "if":
-            cond = subtrees[0]
-            then_branch = subtrees[1]
-            else_branch = subtrees[2]
-            return lambda env: Or(
-                And(self.eval_expr(cond, env), self.wp(then_branch, Q, linv)(env)),
-                And(Not(self.eval_expr(cond, env)), self.wp(else_branch, Q, linv)(env))
-            )
-        elif node_type == "if_unrolled":
-            cond = subtrees[0]
-            then_branch = subtrees[1]
-            else_branch = subtrees[2]
-            program_vars = [*self.env.values()]
-
-            return lambda env: And(
-                linv(env),
-                Or(
-                    And(self.eval_expr(cond, env), self.wp(then_branch, Q, linv)(env)),
-                    And(Not(self.eval_expr(cond, env)), self.wp(else_branch, Q, linv)(env))
-                )
-            )
-        elif node_type == "while":
-            cond = subtrees[0]
-            body = subtrees[1]
-            program_vars = [*self.env.values()]
-
-            return lambda env: And(
-                linv(env),
-                ForAll(program_vars,
-                       And(Implies(And(linv(self.env), self.eval_expr(cond, self.env)), self.wp(body, linv, linv)(self.env)),
-                           Implies(And(linv(self.env), Not(self.eval_expr(cond, self.env))), Q(self.env)))))
-            
-        elif node_type == "assert":
-            cond = subtrees[0]
-            return lambda env: And(self.eval_expr(cond, env), Q(env))
-        
-        elif node_type == "assert_unrolled":
-            cond = subtrees[0]
-            return lambda env: And(Not(self.eval_expr(cond, env)), Q(env))
-        else:
-            raise ValueError(f"Unknown statement type: {node_type}")
+        statements = flatten_sequence(ast)
+        return lambda env: self.execute(statements, Q, linv, env)
+
+    def obligations(self, ast: Tree, P: Invariant, Q: Invariant, linv: Invariant, env: Env = None):
+        """Splits the verification condition of {P} ast {Q} into proof obligations, one for each assertion,
+        for each part of each loop rule and for the postcondition at the end of each path.
+        Returns (pre, obligations, definitions) like `vc`, where each obligation is (name, guard, formula) with
+        the condition of the path to it as the guard. The triple is valid iff
+        Implies(And(pre, *definitions, guard), formula) is valid for all of them.
+        Only for skolemized loop rules, since the obligations are checked for validity."""
+        if not self.skolemize:
+            raise ValueError("Obligations are only made for skolemized loop rules")
+        if env is None:
+            env = self.env
+
+        obligations = []
+        outer, self.definitions = self.definitions, []
+        self.execute(flatten_sequence(ast), Q, linv, env, obligations)
+        definitions, self.definitions = self.definitions, outer
+
+        # The definitions name fresh constants, so every obligation may assume all of them
+        obligations = [(name, And(*guards) if guards else True, formula) for name, guards, formula in obligations]
+        return P(env), obligations, definitions
+
+    def execute(self, statements: list[Tree], Q: Invariant, linv: Invariant, env: Env,
+                obligations: list = None, guards: tuple = (), goal: str = "postcondition") -> Formula:
+        """Computes the weakest precondition of a list of statements in the environment `env`, by running
+        them forward: assignments update `env`, and checks are collected as conjuncts.
+        A statement whose precondition puts the rest of the program under a formula of its own (a loop
+        rule, or a bounded unrolling check) is kept on a stack, which is closed around the rest at the end.
+        Only the branches of conditionals (and of loop bodies) are executed by a nested call, so the
+        depth depends on the nesting of the program and not on its length.
+
+        If `obligations` is given, each check is added to it as (name, guards, formula) instead, where `guards`
+        are the conditions of the path to it, and `Q` at the end is named `goal`. Then True is returned."""
+        conjuncts = []
+        # (conjuncts before the statement, function of the formula of the rest of the program)
+        frames = []
+        formula = None
+
+        def check(name: str, expr: Tree, formula: Formula):
+            # The name is formatted with the text of the expression, only when it is used
+            if obligations is None:
+                conjuncts.append(formula)
+            else:
+                obligations.append((name.format(tree_to_program(expr)), guards, formula))
+
+        pending = statements[::-1]
+        while pending:
+            statement = pending.pop()
+            node_type = statement.root
+            subtrees = statement.subtrees
+
+            if node_type == "skip":
+                continue
+            elif node_type == ":=":
+                env = upd(env, subtrees[0].subtrees[0].root, self.eval_expr(subtrees[1], env))
+            elif node_type in ("if", "if_unrolled"):
+                if node_type == "if_unrolled":
+                    check("while {}: invariant of an unrolled iteration", subtrees[0], linv(env))
+                cond = self.eval_expr(subtrees[0], env)
+                then_branch, else_branch = subtrees[1], subtrees[2]
+                if self.has_loop(then_branch) or self.has_loop(else_branch):
+                    # The state after a loop isn't a function of the state before it, so it can't be named,
+                    # and the rest of the program is computed after each of the branches (see `has_loop`)
+                    rest = pending[::-1]
+                    pending = []
+                    then_wp = self.execute(flatten_sequence(then_branch) + rest, Q, linv, env, obligations, guards + (cond,), goal)
+                    else_wp = self.execute(flatten_sequence(else_branch) + rest, Q, linv, env, obligations, guards + (Not(cond),), goal)
+                    formula = True if obligations is not None else Or(And(cond, then_wp), And(Not(cond), else_wp))
+                    break
+                # The state after the branches is named (see `merge`), so the rest is computed once
+                then_env, else_env = {}, {}
+                capture = lambda d: lambda e: (d.update(e), True)[1]
+                then_wp = self.execute(flatten_sequence(then_branch), capture(then_env), linv, env, obligations, guards + (cond,))
+                else_wp = self.execute(flatten_sequence(else_branch), capture(else_env), linv, env, obligations, guards + (Not(cond),))
+                if obligations is None:
+                    conjuncts += [Implies(cond, then_wp), Implies(Not(cond), else_wp)]
+                env = self.merge(cond, then_env, else_env)
+            elif node_type == "while":
+                check("while {}: invariant on entry", subtrees[0], linv(env))
+                # The rest of the program starts from any state the loop rule quantifies over
+                if obligations is None:
+                    close, env = self.loop_rule(subtrees[0], subtrees[1], linv)
+                    frames.append((conjuncts, close))
+                    conjuncts = []
+                else:
+                    state = self.loop_state()
+                    holds = linv(state)
+                    cond = self.eval_expr(subtrees[0], state)
+                    self.execute(flatten_sequence(subtrees[1]), linv, linv, state, obligations,
+                                 guards + (holds, cond), f"while {tree_to_program(subtrees[0])}: invariant preserved")
+                    env = state
+                    guards += (holds, Not(cond))
+            elif node_type == "assert":
+                check("assert {}", subtrees[0], self.eval_expr(subtrees[0], env))
+            elif node_type == "assert_unrolled":
+                exits = "while {}: exits within the unrolling bound"
+                cond = self.eval_expr(subtrees[0], env)
+                if self.unroll_bound is None:
+                    check(exits, subtrees[0], Not(cond))
+                elif obligations is None:
+                    conjuncts.append(Implies(self.unroll_bound, Not(cond)))
+                    frames.append((conjuncts, lambda rest, cond=cond: Implies(Not(cond), rest)))
+                    conjuncts = []
+                else:
+                    obligations.append((exits.format(tree_to_program(subtrees[0])), guards + (self.unroll_bound,), Not(cond)))
+                    guards += (Not(cond),)
+            else:
+                raise ValueError(f"Unknown statement type: {node_type}")
+
+        if formula is None:
+            formula = Q(env)
+        if obligations is not None:
+            # Captured branch states are not checks
+            if formula is not True:
+                obligations.append((goal, guards, formula))
+            return True
+        formula = And(*conjuncts, formula) if conjuncts else formula
+        while frames:
+            conjuncts, close = frames.pop()
+            formula = close(formula)
+            formula = And(*conjuncts, formula) if conjuncts else formula
+        return formula
+
+    def loop_state(self) -> Env:
+        """The state a loop rule quantifies over: the program variables themselves, or fresh constants for them
+        when the rule is skolemized. The rule only appears positively in the VC, so for validity it may be
+        stated over fresh constants instead of quantified (see `skolemize`)."""
+        if self.skolemize:
+            return {var: FreshInt(var) for var in self.env}
+        return self.env
+
+    def loop_rule(self, cond: Tree, body: Tree, linv: Invariant) -> typing.Tuple[typing.Callable[[Formula], Formula], Env]:
+        """Starts the rule of a `while` loop. Returns the function that closes it around the formula of the
+        rest of the program, and the state the rest of the program is computed from in between."""
+        state = self.loop_state()
+
+        # Intermediate states named inside the loop rule depend on its bound variables,
+        # so their definitions (of the body and of the rest) are kept under the quantifier
+        outer, self.definitions = self.definitions, []
+        body_wp = self.execute(flatten_sequence(body), linv, linv, state)
+
+        def close(rest: Formula) -> Formula:
+            rule = And(Implies(And(linv(state), self.eval_expr(cond, state)), body_wp),
+                       Implies(And(linv(state), Not(self.eval_expr(cond, state))), rest))
+            definitions, self.definitions = self.definitions, outer
+            if definitions:
+                rule = Implies(And(definitions), rule)
+                if not self.skolemize:
+                    rule = ForAll([d.arg(0) for d in definitions], rule)
+            if self.skolemize:
+                return rule
+            return ForAll([*state.values()], rule)
+
+        return close, state
 
 
 
@@ -148,24 +321,176 @@ def verify(P: Invariant, ast: Tree, Q: Invariant, linv: Invariant):
     Returns `True` iff the triple is valid.
     Also prints the counterexample (model) returned from Z3 in case
     it is not.
+    The VC is split into obligations (see `WP.obligations`) which are checked one by one,
+    and the first one that fails gives the counterexample.
     """
-    wp = WP(ast)
-    wp_stmt = wp.wp(ast, Q, linv)
+    wp = WP(ast, skolemize=True)
+    pre, obligations, definitions = wp.obligations(ast, P, Q, linv)
 
-    VC = Implies(P(wp.env), wp_stmt(wp.env))
-    
     solver = Solver()
-    solver.add(Not(VC))
+    solver.add(pre, *definitions)
+
+    for name, guard, formula in obligations:
+        solver.push()
+        solver.add(guard, Not(formula))
+
+        if solver.check() != unsat:
+            logger.info(">> The program is NOT verified.")
+            logger.info("Failed obligation: %s", name)
+            logger.info("Counterexample: %s", solver.model())
+            return False, solver
+        solver.pop()
+
+    logger.info(">> The program is verified.")
+    del solver
+    return True, None
+
+# How often an obligation worker checks that the process which started it is still alive (seconds)
+PARENT_POLL_INTERVAL = 0.2
+
+def _exit_with_parent(parent: int):
+    """Exits the worker process once its parent is gone, even in the middle of a Z3 query
+    (Z3 runs without the GIL), so a terminated verifier doesn't leave its workers behind."""
+    while os.getppid() == parent:
+        time.sleep(PARENT_POLL_INTERVAL)
+    os._exit(1)
+
+def obligation_worker(connection, parent: int):
+    """The loop of an obligation worker process. Each task is (script, selector), where `script` is the SMT-LIB
+    of a solver where each obligation is asserted under a selector (see `verify_obligations`), or None to keep
+    the previous one. Answers with the result of checking the selector, and the model assignments if it fails."""
+    threading.Thread(target = _exit_with_parent, args = (parent,), daemon = True).start()
+    solver = None
+    while True:
+        try:
+            script, selector = connection.recv()
+        except EOFError:
+            return
+        if script is not None:
+            solver = Solver()
+            solver.from_string(script)
+        result = solver.check(Bool(selector))
+        assignments = None
+        if result != unsat:
+            assignments = {var: value.as_long() if is_int_value(value) else str(value)
+                           for var, value in extract_model_assignments(solver).items()}
+        connection.send((str(result), assignments))
+
+class ObligationWorkers:
+    """
+    Worker processes which check the obligations of a VC, kept between verifications.
+    The obligations are handed out one at a time, in order, and the first one (in order) which fails is found:
+    once an obligation fails, the workers still checking later obligations are terminated, and new workers
+    are started in their place when they are needed.
+    """
+
+    class Worker:
+        def __init__(self):
+            self.connection, child = multiprocessing.Pipe()
+            self.process = multiprocessing.Process(target = obligation_worker, args = (child, os.getpid()), daemon = True)
+            self.process.start()
+            child.close()
+            # The script the worker has parsed (by the id of the check it belongs to)
+            self.check = None
+
+        def terminate(self):
+            self.process.terminate()
+            self.process.join()
+            self.connection.close()
+
+    def __init__(self, size: int):
+        self.size = size
+        self.idle = []
+        self.checks = 0
+
+    def first_failure(self, script: str, selectors: list):
+        """Checks the obligations of the script by their `selectors`, in order. Returns the index of the first one
+        which fails and the assignments of its counterexample, or (None, None) if none does."""
+        self.checks += 1
+        check = self.checks
+        failure = (None, None)
+        # The workers checking an obligation, by their connection, with its index
+        busy = {}
+        next_index = 0
+        try:
+            while True:
+                while next_index < len(selectors) and len(busy) < self.size and (failure[0] is None or next_index < failure[0]):
+                    worker = self.idle.pop() if self.idle else self.Worker()
+                    worker.connection.send((script if worker.check != check else None, selectors[next_index]))
+                    worker.check = check
+                    busy[worker.connection] = (worker, next_index)
+                    next_index += 1
+                if not busy:
+                    return failure
+
+                for connection in multiprocessing.connection.wait(list(busy)):
+                    if connection not in busy:
+                        # Terminated by a failure earlier in this batch
+                        continue
+                    worker, index = busy.pop(connection)
+                    try:
+                        result, assignments = connection.recv()
+                    except EOFError:
+                        worker.terminate()
+                        raise RuntimeError(f"An obligation worker exited with code {worker.process.exitcode}")
+                    self.idle.append(worker)
+                    if result != "unsat" and (failure[0] is None or index < failure[0]):
+                        failure = (index, assignments)
+                        # The later obligations don't matter any more
+                        for later in [c for c, (_, i) in busy.items() if i > index]:
+                            busy.pop(later)[0].terminate()
+        finally:
+            # Workers in the middle of a query which isn't needed (or after an error) are not reused
+            for worker, _ in busy.values():
+                worker.terminate()
+
+    def close(self):
+        for worker in self.idle:
+            worker.terminate()
+        self.idle = []
+
+# The obligation workers of `verify_obligations`, started on first use
+_obligation_workers = None
+
+def get_obligation_workers(size: int) -> ObligationWorkers:
+    """The obligation workers of the process, with `size` workers at most"""
+    global _obligation_workers
+    if _obligation_workers is None or _obligation_workers.size != size:
+        if _obligation_workers is not None:
+            _obligation_workers.close()
+        _obligation_workers = ObligationWorkers(size)
+    return _obligation_workers
+
+def verify_obligations(P: Invariant, ast: Tree, Q: Invariant, linv: Invariant, max_workers: int = None):
+    """Verify a Hoare triple {P} c {Q} like `verify`, where the obligations of the VC are checked in parallel
+    by worker processes, which are kept for the next verifications (see `ObligationWorkers`).
+    Returns (True, None, None) if the triple is valid, otherwise (False, name, counterexample) with the name
+    of the first obligation (in program order) which fails and the assignments of its counterexample."""
+    wp = WP(ast, skolemize=True)
+    pre, obligations, definitions = wp.obligations(ast, P, Q, linv)
+
+    # A single script is sent to all the workers, where each obligation is checked by its selector
+    solver = Solver()
+    solver.add(pre, *definitions)
+    selectors = []
+    for i, (name, guard, formula) in enumerate(obligations):
+        selector = f"obligation!{i}"
+        solver.add(Implies(Bool(selector), And(guard, Not(formula))))
+        selectors.append(selector)
+    script = solver.to_smt2()
+
+    workers = get_obligation_workers(max_workers or os.cpu_count() or 1)
+    index, counter_example = workers.first_failure(script, selectors)
+    if index is not None:
+        name = obligations[index][0]
+        logger.info(">> The program is NOT verified.")
+        logger.info("Failed obligation: %s", name)
+        logger.info("Counterexample: %s", counter_example)
+        return False, name, counter_example
+
+    logger.info(">> The program is verified.")
+    return True, None, None
 
-    if solver.check() == unsat:
-        print(">> The program is verified.")
-        del solver
-        return True, None
-    else:
-        print(">> The program is NOT verified.")
-        print("Counterexample:", str(solver.model()) )
-        return False, solver
-    
 def is_exist_input_to_satisfy(P: Invariant, ast: Tree, Q: Invariant, linv: Invariant):
     """Verify a Hoare triple {P} c {Q}
     Where P, Q are assertions (see below for examples)
@@ -176,22 +501,22 @@ def is_exist_input_to_satisfy(P: Invariant, ast: Tree, Q: Invariant, linv: Invar
     """
 
     wp = WP(ast)
-    wp_stmt = wp.wp(ast, Q, linv)
+    pre, post, definitions = wp.vc(ast, P, Q, linv)
 
     # VC = Implies(P(wp.env), wp_stmt(wp.env))
-    VC = And(P(wp.env), wp_stmt(wp.env))
+    VC = And(pre, post, *definitions)
     
     solver = Solver()
     solver.add(VC)
 
-    print("Model:", solver)
+    logger.debug("Model: %s", solver)
 
     if solver.check() == sat:
-        print(">> The program has satisfying inputs.")
-        print("Satisfying input:", solver.model())
+        logger.info(">> The program has satisfying inputs.")
+        logger.debug("Satisfying input: %s", solver.model())
         return True, solver
     else:
-        print(">> No satisfying input found.")
+        logger.info(">> No satisfying input found.")
         del solver
         return False, None
 
@@ -199,10 +524,36 @@ def extract_model_assignments(solver):
     model = solver.model()
     assignments = {}
     for var in model:
-        assignments[str(var)] = model[var]
+        # Skip the intermediate states named by the VC (fresh constants such as 'x!0')
+        if "!" not in str(var):
+            assignments[str(var)] = model[var]
     
     return assignments
 
+
+def eval_conditions(P_str, Q_str, linv_str):
+    """Evaluates the precondition, postcondition and loop invariant strings into invariants.
+    Each string is the body of a lambda over the environment `d`, e.g. "d['x'] > 0"."""
+    P = lambda _: True
+    Q = lambda _: True
+    linv = lambda _: True
+
+    safe_env = {
+        'And': And, 'Or': Or, 'Implies': Implies, 'Not': Not, 'ForAll': ForAll
+    }
+
+    if P_str != None:
+        P = eval("lambda d:" + P_str, safe_env)
+    
+    if Q_str != None:
+        Q = eval("lambda d:" + Q_str, safe_env)
+
+    if linv_str != None:
+        linv = eval("lambda d:" + linv_str, safe_env)
+
+    return P, Q, linv
+
+
 def main():
     # example program
     # pvars = ["a", "b", "i", "n"]
@@ -236,6 +587,8 @@ def main():
     # Q = lambda d: And(d['a'] > 0, d['a'] == d['b'])
     # linv = lambda d: ???
 
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     ast = parse(program)
 
     if ast is not None:
@@ -247,4 +600,5 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
+
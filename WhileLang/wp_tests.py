@@ -0,0 +1,79 @@
+from syntax.while_lang import parse, remove_assertions_ast
+from wp import WP, verify, verify_obligations, get_obligation_workers
+from z3 import And, Implies, Not, Solver
+
+RED = "\033[31m"
+GREEN = "\033[32m"
+RESET = "\033[0m"
+
+def long_program_verify_case():
+    """The verification of a long program shouldn't depend on the interpreter stack"""
+    statements = ["x := x + 1", "if x > 3 then y := y + x else y := y - 0", "assert y >= 0"] * 2000
+    tree = remove_assertions_ast(parse(" ; ".join(statements)))
+    verified, _ = verify(lambda d: And(d["x"] == 0, d["y"] == 0), tree, lambda d: d["x"] == 2000, lambda d: True)
+    if not verified:
+        print(f"{RED}Long program verification failed!{RESET}")
+        return False
+    return True
+
+def skolem_case():
+    """Loop rules over fresh constants should make a quantifier free VC, with the same validity"""
+    tree = parse("y := 0 ; while x > 0 do ( x := x - 1 ; while z > 0 do ( z := z - 1 ; y := y + 1 ) ) ; y := y + x")
+    results = []
+    for linv in [lambda d: And(d["x"] >= 0, d["y"] >= 0), lambda d: d["y"] >= 0]:
+        for skolemize in [False, True]:
+            pre, post, definitions = WP(tree, skolemize=skolemize).vc(tree, lambda d: d["x"] >= 0, lambda d: d["y"] >= 0, linv)
+            if skolemize and "ForAll" in str(post):
+                print(f"{RED}Skolemized VC has quantifiers!{RESET}")
+                return False
+            solver = Solver()
+            solver.add(Not(Implies(And(pre, *definitions), post)))
+            results.append(str(solver.check()))
+    if results != ["unsat", "unsat", "sat", "sat"]:
+        print(f"{RED}Skolemized VC failed! {results}{RESET}")
+        return False
+    return True
+
+
+def obligations_case():
+    """The VC should be split into named obligations, and the first failing one should be reported"""
+    tree = parse("y := x ; assert y > 3 ; while x > 0 do x := x - 1 ; y := y - 2 ; assert y > 0")
+    P, Q, linv = lambda d: d["x"] > 0, lambda d: d["x"] == 0, lambda d: d["x"] >= 0
+    pre, obligations, definitions = WP(tree, skolemize=True).obligations(tree, P, Q, linv)
+    names = [name for name, _, _ in obligations]
+    expected = ["assert (y > 3)", "while (x > 0): invariant on entry", "while (x > 0): invariant preserved", "assert (y > 0)", "postcondition"]
+    if names != expected:
+        print(f"{RED}Obligations failed! {names}{RESET}")
+        return False
+    # Both assertions fail, and the earlier one is reported however the workers are scheduled
+    for _ in range(5):
+        verified, failed, counter_example = verify_obligations(P, tree, Q, linv, max_workers=2)
+        if verified or failed != "assert (y > 3)" or counter_example["x"] not in (1, 2, 3):
+            print(f"{RED}Obligations verification failed! {failed} {counter_example}{RESET}")
+            return False
+    if verify(P, tree, Q, linv)[0] or len(get_obligation_workers(2).idle) > 2:
+        print(f"{RED}Obligations verification failed!{RESET}")
+        return False
+    # The loop rule is over any state, so the invariant keeps what the assertion after it needs
+    linv = lambda d: And(d["x"] >= 0, d["y"] > 2)
+    verified, _, _ = verify_obligations(lambda d: d["x"] > 3, tree, Q, linv, max_workers=2)
+    if not verified or not verify(lambda d: d["x"] > 3, tree, Q, linv)[0]:
+        print(f"{RED}Obligations verification failed!{RESET}")
+        return False
+    return True
+
+def wp_tests():
+    results = []
+    if not long_program_verify_case():
+        results.append("long_program_verify_case")
+    if not skolem_case():
+        results.append("skolem_case")
+    if not obligations_case():
+        results.append("obligations_case")
+
+    print(f"\n********************************\n")
+
+    if results == []:
+        print(f"{GREEN}All tests passed!{RESET}")
+    else:
+        print(f"{RED}Tests failed: {RESET} {results}")